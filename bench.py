@@ -0,0 +1,187 @@
+"""Benchmarks and sanity checks for the display.
+
+    python bench.py calc                    # year-table generation time
+    python bench.py compare [response.json ...]
+        # offline calculator vs saved Aladhan calendarByCity responses
+        # (defaults to fixtures/aladhan-*.json, then the timetable cached in settings.txt)
+    python bench.py fetch YYYY-MM           # save that month's response to fixtures/ for compare
+    python bench.py day [YYYY-MM-DD]        # simulate a whole day headless (default: next Friday)
+    python bench.py ticker [frames]         # cost of one ticker frame
+"""
+import glob
+import json
+import os
+import sys
+import time
+import timeit
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import main
+from headless import RecordingCanvas, SimRoot
+
+
+def bench_year_table(year=None, repeat=20):
+    year = year or date.today().year
+    calc = main.PrayerCalculator()
+    runs = timeit.repeat(lambda: calc.compute(date(year, 1, 1), 365), number=1, repeat=repeat)
+    table = calc.year_table(year)
+    print(f"Year table {year}: best {min(runs) * 1000:.2f} ms, median {sorted(runs)[len(runs) // 2] * 1000:.2f} ms "
+          f"over {repeat} runs, {table.nbytes} bytes ({table.shape[0]} days x {table.shape[1]} times)")
+    day = date(year, 6, 15)
+    lookups = timeit.timeit(lambda: calc.times_for(day), number=10000)
+    print(f"Day lookup: {lookups / 10000 * 1e6:.2f} us")
+
+
+FIXTURES = os.path.join(main.BASE_DIR, "fixtures")
+
+
+def fetch_fixture(month):
+    """Saves one raw calendarByCity response, queried exactly as the display queries it."""
+    import requests
+    year, month = map(int, month.split("-"))
+    response = requests.get(main.PrayerTimeFetcher.API_URL.format(year=year, month=month),
+                            params=main.PrayerTimeFetcher.params(), timeout=(5, 15))
+    response.raise_for_status()
+    os.makedirs(FIXTURES, exist_ok=True)
+    path = os.path.join(FIXTURES, f"aladhan-{main.CITY.lower()}-{year}-{month:02d}.json")
+    with open(path, "w") as f:
+        json.dump(response.json(), f)
+    print(f"Saved {path}")
+
+
+def load_saved_timings(paths):
+    if not paths: paths = sorted(glob.glob(os.path.join(FIXTURES, "aladhan-*.json")))
+    if not paths:
+        try:
+            with open(main.SETTINGS_FILE) as f:
+                return json.load(f).get("timetable", {})
+        except (OSError, ValueError):
+            return {}
+    timings = {}
+    for path in paths:
+        with open(path) as f:
+            for day in json.load(f)["data"]:
+                d, m, y = day["date"]["gregorian"]["date"].split("-")
+                timings[f"{y}-{m}-{d}"] = {p: [int(x) for x in day["timings"][p][:5].split(":")]
+                                           for p in main.PRAYER_ORDER}
+    return timings
+
+
+def compare_with_api(paths=()):
+    saved = load_saved_timings(paths)
+    if not saved:
+        print("No saved API timings to compare against; run `python bench.py fetch YYYY-MM` while online.")
+        return
+    calc = main.PrayerCalculator()
+    diffs = {p: [] for p in main.PRAYER_ORDER}
+    for day, times in saved.items():
+        ours = calc.times_for(date.fromisoformat(day))
+        for p in main.PRAYER_ORDER:
+            diffs[p].append((ours[p][0] * 60 + ours[p][1]) - (times[p][0] * 60 + times[p][1]))
+    print(f"Offline calculator vs API over {len(saved)} days (minutes, ours - API):")
+    for p, d in diffs.items():
+        print(f"  {p:<8} mean {sum(d) / len(d):+.2f}  max |diff| {max(abs(x) for x in d)}")
+
+
+def make_display(start):
+    root = SimRoot(start)
+    canvas = RecordingCanvas()
+    app = main.MosqueDisplay(root, canvas=canvas, clock=root.now, monotonic=root.monotonic,
+                             settings=main.SettingsStore(path=None),
+                             metrics=main.Metrics(root, root.monotonic, path=None), online=False, backgrounds=False)
+    return root, canvas, app
+
+
+def instrument(app, canvas, names):
+    """Wraps display callbacks on the instance, recording wall time and canvas ops per call."""
+    stats = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "ops": 0})
+    for owner, name in names:
+        func = getattr(owner, name)
+
+        def timed(*args, _func=func, _name=name, **kwargs):
+            ops, start = canvas.total_ops(), time.perf_counter()
+            try:
+                return _func(*args, **kwargs)
+            finally:
+                s = stats[_name]
+                s["calls"] += 1
+                s["seconds"] += time.perf_counter() - start
+                s["ops"] += canvas.total_ops() - ops
+        setattr(owner, name, timed)
+    return stats
+
+
+def instrument_frames(app, canvas, stats):
+    """Canvas ops are merged and flushed once per frame, so they are counted per frame, split by whether the
+    frame carried a clock tick or only ticker and fade steps."""
+    run_frame = app.scheduler.run_frame
+
+    def timed():
+        ticks, ops, start = stats["update_clock"]["calls"], canvas.total_ops(), time.perf_counter()
+        try:
+            return run_frame()
+        finally:
+            s = stats["frame (clock tick)" if stats["update_clock"]["calls"] > ticks else "frame (ticker/fade)"]
+            s["calls"] += 1
+            s["seconds"] += time.perf_counter() - start
+            s["ops"] += canvas.total_ops() - ops
+    app.scheduler.run_frame = timed
+
+
+def report(stats):
+    for name, s in sorted(stats.items()):
+        if not s["calls"]: continue
+        print(f"  {name:<24} {s['calls']:>8} calls  {s['seconds'] / s['calls'] * 1e6:>9.1f} us/call  "
+              f"{s['ops'] / s['calls']:>6.2f} canvas ops/call")
+
+
+def simulate_day(day=None):
+    """Runs a full day (midnight to midnight) with alerts, iqamath countdowns and, on Fridays, Jumu'ah."""
+    if day is None:
+        day = date.today() + timedelta(days=(4 - date.today().weekday()) % 7)
+    root, canvas, app = make_display(datetime(day.year, day.month, day.day))
+    alerts = []
+    trigger = app.trigger_prayer_alert
+    app.trigger_prayer_alert = lambda p, d: (alerts.append((root.now().strftime("%H:%M:%S"), p)), trigger(p, d))
+    stats = instrument(app, canvas, [(app, "update_clock"), (app, "update_prayer_list"),
+                                     (app, "handle_iqamath_display"), (app, "scroll_ticker"), (app, "run_timeline"),
+                                     (app.animator, "step")])
+    instrument_frames(app, canvas, stats)
+    wall = time.perf_counter()
+    root.run_until(datetime(day.year, day.month, day.day) + timedelta(days=1))
+    wall = time.perf_counter() - wall
+    print(f"Simulated {day:%A %Y-%m-%d} in {wall:.1f} s ({86400 / wall:.0f}x real time), "
+          f"{root.callbacks_run} callbacks, {app.scheduler.frames} frames, {canvas.total_ops()} canvas ops")
+    print(f"  alerts: {', '.join(f'{p} {t}' for t, p in alerts)}")
+    print(f"  Dhuhr label: {canvas.text_of(app.prayer_objs['Dhuhr']['main'])!r}")
+    report(stats)
+
+
+def bench_ticker(frames=5000):
+    root, canvas, app = make_display(datetime.combine(date.today(), datetime.min.time()) + timedelta(hours=9))
+    app.raw_announcements = ";; " + ",, ".join(f"Announcement number {i}" for i in range(40))
+    app.create_rich_ticker()
+    ops, start = canvas.total_ops(), time.perf_counter()
+    for _ in range(frames):
+        root.elapsed_ms += 30
+        app.scroll_ticker()
+    per_frame = (time.perf_counter() - start) / frames
+    print(f"Ticker: {len(app.ticker_items)} items, {per_frame * 1e6:.1f} us/frame, "
+          f"{(canvas.total_ops() - ops) / frames:.2f} canvas ops/frame")
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "calc"
+    if cmd == "calc":
+        bench_year_table()
+    elif cmd == "compare":
+        compare_with_api(sys.argv[2:])
+    elif cmd == "fetch":
+        fetch_fixture(sys.argv[2] if len(sys.argv) > 2 else f"{date.today():%Y-%m}")
+    elif cmd == "day":
+        simulate_day(date.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else None)
+    elif cmd == "ticker":
+        bench_ticker(int(sys.argv[2]) if len(sys.argv) > 2 else 5000)
+    else:
+        print(__doc__)
@@ -0,0 +1,289 @@
+"""Printable azan/iqamath timetables for one or many mosques, without a display.
+
+    python export.py [mosques.json] [--start YYYY-MM-DD] [--end YYYY-MM-DD] [--out DIR]
+                     [--formats csv,json,png] [--workers N]
+
+mosques.json is a list of mosque configs (or {"mosques": [...]}); every key is optional:
+
+    {"name": "...", "latitude": 5.9485, "longitude": 80.5353, "timezone": 5.5, "method": 1, "asr_school": 0,
+     "high_lat": "AngleBased", "hijri_offset": 0,
+     "settings": "path/to/settings.txt",                  # a display's saved iqamath rules and fetched timings
+     "prayer_data": {"Dhuhr": {"iqamath": 15, "jumuah_iqamath": 45}}}
+
+Without a config file the timetable is made for this display from settings.txt. The range defaults to the
+current year. Each mosque gets <slug>.csv, <slug>.json and one <slug>-YYYY-MM.png sheet per month under
+--out, written as the days are generated rather than collected first.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from functools import lru_cache
+
+import main
+
+CSV_HEADER = ["date", "weekday", "hijri"] + [c for p in main.PRAYER_ORDER
+                                             for c in ([p] if p == "Sunrise" else [p, f"{p} iqamath"])]
+SHEET_SIZE = (1654, 2339)  # A4 at 200 dpi
+SHEET_COLUMNS = ["Date", "Day", "Hijri"] + [c for p in main.PRAYER_ORDER
+                                            for c in ([p] if p == "Sunrise" else [p, "Iq"])]
+
+
+# ---- caches shared by every mosque a worker process handles ----
+@lru_cache(maxsize=None)
+def calculator(lat, lon, tz, method, asr_school, high_lat):
+    # Mosques with the same location and method share one set of year tables
+    return main.PrayerCalculator(lat, lon, tz, method, asr_school, high_lat)
+
+
+@lru_cache(maxsize=None)
+def hijri_calendar(offset):
+    return main.HijriCalendar(offset)
+
+
+@lru_cache(maxsize=None)
+def sheet_font(size):
+    from PIL import ImageFont
+    path = main.SpriteCache.find_font()
+    return ImageFont.truetype(path, size) if path else ImageFont.load_default(size)
+
+
+@lru_cache(maxsize=4096)
+def text_mask(text, size):
+    """Centre-anchored coverage mask of `text`; the same few hundred times repeat across every sheet."""
+    from PIL import Image, ImageDraw
+    font = sheet_font(size)
+    left, top, right, bottom = font.getbbox(text, anchor="mm")
+    mask = Image.new("L", (max(right - left, 1), max(bottom - top, 1)))
+    ImageDraw.Draw(mask).text((-left, -top), text, font=font, fill=255, anchor="mm")
+    return mask, left, top
+
+
+def paste_text(image, x, y, text, size, fill):
+    mask, left, top = text_mask(text, size)
+    image.paste(fill, (round(x + left), round(y + top)), mask)
+
+
+def calc_key(config):
+    return (config.get("latitude", main.LATITUDE), config.get("longitude", main.LONGITUDE),
+            config.get("timezone", main.TIMEZONE), config.get("method", main.METHOD),
+            config.get("asr_school", main.ASR_SCHOOL), config.get("high_lat", main.HIGH_LAT_RULE))
+
+
+def slugify(name):
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-") or "mosque"
+
+
+def load_config(config):
+    """Resolves a config into (prayer_data, timetable, hijri_offset), layering inline values over a settings
+    file."""
+    prayer_data = json.loads(json.dumps(main.DEFAULT_PRAYER_DATA))
+    timetable = {}
+    hijri_offset = 0
+    if config.get("settings"):
+        saved = main.SettingsStore(config["settings"]).load()
+        for prayer, d in saved.get("prayer_data", {}).items():
+            if prayer in prayer_data: prayer_data[prayer].update(d)
+        timetable = saved.get("timetable", {})
+        hijri_offset = saved.get("hijri_offset", 0)  # The display's moon-sighting offset
+    for prayer, d in config.get("prayer_data", {}).items():
+        prayer_data[prayer].update(d)
+    return prayer_data, timetable, config.get("hijri_offset", hijri_offset)
+
+
+def check_config(config):
+    """Raises ValueError for anything that would otherwise only fail inside a worker, part-way through a run."""
+    method = config.get("method", main.METHOD)
+    if method not in main.CALC_METHODS: raise ValueError(f"unknown method {method!r}")
+    high_lat = config.get("high_lat", main.HIGH_LAT_RULE)
+    if high_lat not in (None, "AngleBased", "OneSeventh", "NightMiddle"):
+        raise ValueError(f"unknown high_lat rule {high_lat!r}")
+    unknown = set(config.get("prayer_data", {})) - set(main.PRAYER_ORDER)
+    if unknown: raise ValueError(f"unknown prayer {', '.join(sorted(unknown))}")
+
+
+def mosque_days(config, start, end):
+    """Resolves the config up front, so a bad settings file or an unsolvable latitude fails before any file is
+    opened, and returns a generator of (day, Hijri text, Hijri (y, m, d) or None, day_schedule rows) for every
+    day in [start, end]."""
+    prayer_data, timetable, hijri_offset = load_config(config)
+    calc = calculator(*calc_key(config))
+    for year in range(start.year, end.year + 1): calc.year_table(year)
+    return _days(prayer_data, timetable, calc, hijri_calendar(hijri_offset), start, end)
+
+
+def _days(prayer_data, timetable, calc, hijri, start, end):
+    day = start
+    while day <= end:
+        # Fetched Aladhan timings win, as on the display; the offline tables cover the rest
+        timings = timetable.get(day.isoformat()) or calc.times_for(day)
+        for prayer, hm in timings.items(): prayer_data[prayer]["time"] = list(hm)
+        yield day, hijri.text_for(day) or "", hijri.lookup(day), main.day_schedule(prayer_data, day)
+        day += timedelta(days=1)
+
+
+def csv_row(day, hijri, rows):
+    row = [day.isoformat(), main.WEEKDAYS[day.weekday()], hijri]
+    for prayer in main.PRAYER_ORDER:
+        row.append(rows[prayer]["azan_text"])
+        if prayer != "Sunrise": row.append(rows[prayer]["iq_text"])
+    return row
+
+
+def json_day(day, hijri, rows):
+    prayers = {}
+    for prayer in main.PRAYER_ORDER:
+        r = rows[prayer]
+        prayers[prayer] = {"name": r["name"], "azan": r["azan_text"]}
+        if prayer != "Sunrise": prayers[prayer]["iqamath"] = r["iq_text"]
+    return {"date": day.isoformat(), "weekday": main.WEEKDAYS[day.weekday()], "hijri": hijri, "prayers": prayers}
+
+
+def render_sheet(path, title, month, days):
+    """Draws one month as a printable table, Fridays shaded with the Jumu'ah iqamath in the Dhuhr column."""
+    from PIL import Image, ImageDraw
+    width, height = SHEET_SIZE
+    image = Image.new("L", SHEET_SIZE, 255)  # Greyscale prints the same and encodes a third of the bytes
+    draw = ImageDraw.Draw(image)
+    margin = 60
+    paste_text(image, width / 2, margin + 30, title, 56, 0)
+    paste_text(image, width / 2, margin + 100, month.strftime("%B %Y"), 40, 68)
+    top, row_h = margin + 170, min(60, (height - margin - 230) // 32)
+    col_w = (width - 2 * margin) / len(SHEET_COLUMNS)
+    size = int(row_h * 0.5)
+    draw.rectangle((margin, top, width - margin, top + row_h), fill=26)
+    for i, label in enumerate(SHEET_COLUMNS):
+        paste_text(image, margin + (i + 0.5) * col_w, top + row_h / 2, label, int(size * 0.85), 255)  # "Sunrise" fits
+    for n, (day, hijri, rows) in enumerate(days, 1):  # hijri is the (y, m, d) tuple here
+        y = top + n * row_h
+        if day.weekday() == 4: draw.rectangle((margin, y, width - margin, y + row_h), fill=232)
+        cells = [f"{day.day}", main.WEEKDAYS[day.weekday()], f"{hijri[2]}/{hijri[1]}" if hijri else ""]
+        cells += csv_row(day, "", rows)[3:]
+        for i, text in enumerate(cells):
+            paste_text(image, margin + (i + 0.5) * col_w, y + row_h / 2, text, size, 0)
+        draw.line((margin, y + row_h, width - margin, y + row_h), fill=204)
+    image.save(path, compress_level=1)  # Fast to write; these are regenerated, not archived
+
+
+def export_mosque(config, start, end, out, formats):
+    """Writes one mosque's files while its days are generated; returns (name, days, files). Files of a mosque
+    that fails part-way are removed rather than left truncated."""
+    name = config.get("name", main.MASJID_NAME.replace("\n", " ").strip())
+    slug = slugify(config.get("slug") or name)
+    days = mosque_days(config, start, end)
+    os.makedirs(out, exist_ok=True)
+    base = os.path.join(out, slug)
+    files = []
+    csv_file = json_file = None
+    done = False
+    try:
+        if "csv" in formats:
+            csv_file = open(base + ".csv", "w", newline="", encoding="utf-8")
+            writer = csv.writer(csv_file)
+            writer.writerow(CSV_HEADER)
+            files.append(csv_file.name)
+        if "json" in formats:
+            json_file = open(base + ".json", "w", encoding="utf-8")
+            json_file.write(f'{{"name": {json.dumps(name)}, "start": "{start}", "end": "{end}", "days": [')
+            files.append(json_file.name)
+        month, count = [], 0
+        for day, hijri, hijri_date, rows in days:
+            if csv_file: writer.writerow(csv_row(day, hijri, rows))
+            if json_file: json_file.write((",\n" if count else "\n") + json.dumps(json_day(day, hijri, rows)))
+            count += 1
+            if "png" in formats:
+                month.append((day, hijri_date, rows))
+                if (day + timedelta(days=1)).day == 1 or day == end:
+                    path = f"{base}-{day:%Y-%m}.png"
+                    files.append(path)
+                    render_sheet(path, name, day, month)
+                    month = []
+        if json_file: json_file.write("\n]}\n")
+        done = True
+    finally:
+        if csv_file: csv_file.close()
+        if json_file: json_file.close()
+        if not done:
+            for path in files:
+                if os.path.exists(path): os.remove(path)
+    return name, count, files
+
+
+def load_mosques(path):
+    if path is None: return [{"name": main.MASJID_NAME.replace("\n", " ").strip(), "settings": main.SETTINGS_FILE}]
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    mosques = data["mosques"] if isinstance(data, dict) else data
+    base = os.path.dirname(os.path.abspath(path))
+    problems = []
+    for i, config in enumerate(mosques, 1):
+        if config.get("settings"): config["settings"] = os.path.join(base, config["settings"])
+        try:
+            check_config(config)
+        except ValueError as e:
+            problems.append(f"mosque {i} ({config.get('name', 'unnamed')}): {e}")
+    if problems: raise ValueError("; ".join(problems))
+    return mosques
+
+
+def assign_slugs(mosques):
+    """Gives every config its own file name, suffixing repeats ("jumma-masjid-2") so no two processes write
+    the same files."""
+    taken = set()
+    for config in mosques:
+        base = slugify(config.get("slug") or config.get("name", main.MASJID_NAME.replace("\n", " ").strip()))
+        slug, n = base, 1
+        while slug in taken:
+            n += 1
+            slug = f"{base}-{n}"
+        if slug != base: print(f"{config.get('name', base)!r} shares its file name with another mosque; using {slug}")
+        taken.add(slug)
+        config["slug"] = slug
+    return mosques
+
+
+def run(mosques, start, end, out, formats, workers=None):
+    assign_slugs(mosques)
+    started = time.perf_counter()
+    total = failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # One mosque per task so the pool stays busy even when most configs share a location; each worker's
+        # lru_caches still compute a shared location's year tables only once
+        futures = {pool.submit(export_mosque, config, start, end, out, formats): config for config in mosques}
+        for future in as_completed(futures):
+            try:
+                name, days, files = future.result()
+            except Exception as e:  # One bad mosque must not cost the rest of the district its timetables
+                failed += 1
+                config = futures[future]
+                print(f"{config.get('name', config['slug'])}: failed, {type(e).__name__}: {e}")
+                continue
+            total += days
+            print(f"{name}: {days} days, {len(files)} files")
+    print(f"Exported {len(mosques) - failed} mosques ({total} mosque-days) in {time.perf_counter() - started:.1f} s "
+          f"to {out}" + (f"; {failed} failed" if failed else ""))
+    return failed
+
+
+if __name__ == "__main__":
+    year = date.today().year
+    parser = argparse.ArgumentParser(description="Export azan/iqamath timetables for one or many mosques")
+    parser.add_argument("config", nargs="?", help="JSON list of mosque configs (default: this display)")
+    parser.add_argument("--start", type=date.fromisoformat, default=date(year, 1, 1))
+    parser.add_argument("--end", type=date.fromisoformat, default=date(year, 12, 31))
+    parser.add_argument("--out", default=os.path.join(main.BASE_DIR, "timetables"))
+    parser.add_argument("--formats", default="csv,json,png", help="comma-separated subset of csv,json,png")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per CPU)")
+    args = parser.parse_args()
+    if args.end < args.start: parser.error("--end is before --start")
+    formats = set(args.formats.split(","))
+    if not formats <= {"csv", "json", "png"}: parser.error(f"unknown format in {args.formats!r}")
+    try:
+        mosques = load_mosques(args.config)
+    except ValueError as e:  # Also covers malformed JSON
+        parser.error(f"{args.config}: {e}")
+    if run(mosques, args.start, args.end, args.out, formats, args.workers): raise SystemExit(1)
@@ -0,0 +1,157 @@
+"""In-memory stand-ins for tk.Tk and tk.Canvas, so MosqueDisplay can run without a display.
+
+SimRoot is a virtual-time event loop: after() callbacks are queued against a simulated clock and run_until()
+jumps straight from one deadline to the next, so a whole day runs in seconds. RecordingCanvas keeps every item's
+options in a dict and counts the calls made to it.
+"""
+import heapq
+import itertools
+from collections import Counter
+from datetime import timedelta
+
+from PIL import ImageColor
+
+
+class SimRoot:
+    def __init__(self, start, width=1920, height=1080):
+        self.start = start
+        self.elapsed_ms = 0
+        self.width, self.height = width, height
+        self._queue = []
+        self._ids = itertools.count(1)
+        self._cancelled = set()
+        self.bindings = {}
+        self.callbacks_run = 0
+
+    # ---- clocks handed to MosqueDisplay ----
+    def now(self):
+        return self.start + timedelta(milliseconds=self.elapsed_ms)
+
+    def monotonic(self):
+        return self.elapsed_ms / 1000
+
+    # ---- the part of tk.Tk the display uses ----
+    def after(self, ms, func):
+        timer = next(self._ids)
+        heapq.heappush(self._queue, (self.elapsed_ms + max(int(ms), 0), timer, func))
+        return timer
+
+    def after_idle(self, func):
+        return self.after(0, func)
+
+    def after_cancel(self, timer):
+        self._cancelled.add(timer)
+
+    def bind(self, sequence, func):
+        self.bindings[sequence] = func
+
+    def attributes(self, *args):
+        pass
+
+    def configure(self, **options):
+        pass
+
+    config = configure
+
+    def winfo_screenwidth(self):
+        return self.width
+
+    def winfo_screenheight(self):
+        return self.height
+
+    def winfo_rgb(self, color):
+        return tuple(c * 257 for c in ImageColor.getrgb(color)[:3])
+
+    def update_idletasks(self):
+        pass
+
+    def destroy(self):
+        self._queue.clear()
+
+    # ---- driving the simulation ----
+    def run_until(self, when):
+        """Runs every callback due up to `when` (a datetime), advancing the virtual clock as it goes."""
+        end = (when - self.start) / timedelta(milliseconds=1)
+        while self._queue and self._queue[0][0] <= end:
+            due, timer, func = heapq.heappop(self._queue)
+            if timer in self._cancelled:
+                self._cancelled.discard(timer)
+                continue
+            self.elapsed_ms = max(self.elapsed_ms, due)
+            self.callbacks_run += 1
+            func()
+        self.elapsed_ms = max(self.elapsed_ms, end)
+
+    def run_for(self, seconds):
+        self.run_until(self.now() + timedelta(seconds=seconds))
+
+
+class RecordingCanvas:
+    # Rough glyph width as a fraction of the point size, good enough for layout and bbox
+    CHAR_WIDTH = 0.6
+
+    def __init__(self):
+        self.items = {}
+        self.ops = Counter()
+        self._ids = itertools.count(1)
+
+    def _create(self, kind, coords, options):
+        self.ops["create"] += 1
+        item = next(self._ids)
+        self.items[item] = dict(options, kind=kind, coords=list(coords))
+        return item
+
+    def create_text(self, *coords, **options):
+        return self._create("text", coords, options)
+
+    def create_rectangle(self, *coords, **options):
+        return self._create("rectangle", coords, options)
+
+    def create_image(self, *coords, **options):
+        return self._create("image", coords, options)
+
+    def _find(self, tag_or_id):
+        if tag_or_id in self.items: return [tag_or_id]
+        return [i for i, o in self.items.items() if tag_or_id in o.get("tags", ())]
+
+    def itemconfig(self, tag_or_id, **options):
+        self.ops["itemconfig"] += 1
+        for item in self._find(tag_or_id): self.items[item].update(options)
+
+    itemconfigure = itemconfig
+
+    def itemcget(self, item, option):
+        self.ops["itemcget"] += 1
+        return self.items[item].get(option, "")
+
+    def coords(self, item, *coords):
+        self.ops["coords"] += 1
+        if coords: self.items[item]["coords"] = list(coords)
+        return self.items[item]["coords"]
+
+    def move(self, tag_or_id, dx, dy):
+        self.ops["move"] += 1
+        for item in self._find(tag_or_id):
+            c = self.items[item]["coords"]
+            c[0] += dx
+            c[1] += dy
+
+    def bbox(self, item):
+        self.ops["bbox"] += 1
+        o = self.items[item]
+        if o.get("state") == "hidden": return None  # Like Tk, hidden items have no bbox
+        x, y = o["coords"][:2]
+        size = abs(o.get("font", ("", 12))[1])
+        lines = str(o.get("text", "")).split("\n")
+        w = int(max(len(line) for line in lines) * size * self.CHAR_WIDTH)
+        return x, y - size, x + w, y + size * len(lines)
+
+    def delete(self, tag_or_id):
+        self.ops["delete"] += 1
+        for item in self._find(tag_or_id): del self.items[item]
+
+    def text_of(self, item):
+        return self.items[item].get("text", "")
+
+    def total_ops(self):
+        return sum(self.ops.values())
@@ -1,18 +1,49 @@
+import time
+
+STARTUP_T0 = time.perf_counter()
+
 import tkinter as tk
-from datetime import datetime, timedelta
-from hijridate import Gregorian
-from PIL import Image, ImageTk
+from bisect import bisect_right
+from collections import OrderedDict, defaultdict, deque
+from datetime import date, datetime, timedelta
 import os
+import glob
+from array import array
+import hashlib
 import json
 import re
-import requests
+import queue
+import threading
+import math
+
+# numpy, requests, PIL, hijridate and http.server are imported where they are used, so the first frame does not wait for them
 
 # ================= SETTINGS =================
 MASJID_NAME = "Porwai Muhiyaddeen \n Jumma Masjid"
-SETTINGS_FILE = "settings.txt"
 CITY = "Matara"
 COUNTRY = "Sri Lanka"
 METHOD = 1
+LATITUDE = 5.9485
+LONGITUDE = 80.5353
+TIMEZONE = 5.5  # hours from UTC, Sri Lanka does not observe DST
+ASR_SCHOOL = 0  # 0 = Shafi (shadow factor 1), 1 = Hanafi (shadow factor 2); same numbering as Aladhan
+HIGH_LAT_RULE = "AngleBased"  # "AngleBased", "OneSeventh", "NightMiddle" or None
+FETCH_MONTHS_AHEAD = 2  # months of timings pulled per refresh (current month + this many - 1)
+FETCH_REFRESH_DAYS = 7  # refresh in the background once cached coverage drops below this
+TICKER_SPEED = 66  # px/s, the old fixed 2 px per 30 ms frame
+TICKER_FPS = 33
+STARTUP_DEFER_MS = 100  # gap between the first frame and the deferred startup work
+TICKER_FONT = ("Arial", 32, "bold")
+# Draw each shadowed label as one pre-rendered PIL image instead of five canvas text items
+SPRITE_TEXT = False
+SPRITE_CACHE_MB = 48
+SPRITE_FONT_FILES = ["/usr/share/fonts/truetype/msttcorefonts/Arial_Bold.ttf", "C:/Windows/Fonts/arialbd.ttf",
+                     "/Library/Fonts/Arial Bold.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+                     "/usr/share/fonts/truetype/freefont/FreeSansBold.ttf"]
+HIJRI_MAX_OFFSET = 2  # days the local moon-sighting offset may move the Hijri date either way
+HIGHLIGHT_MINUTES = 60  # how long a prayer stays highlighted after its azan
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+TIMELINE_MAX_SLEEP = 60  # seconds; re-check at least this often so wall-clock jumps (NTP at boot) are noticed
 
 COLORS = [
     "gold", "cyan", "#00FF00", "white", "#00CCFF", "red", "#FFBF00", "magenta",
@@ -34,18 +65,1138 @@ PRAYER_ORDER = ["Fajr", "Sunrise", "Dhuhr", "Asr", "Maghrib", "Isha"]
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 IMAGE_PATH = os.path.join(BASE_DIR, "images.png")
+SETTINGS_FILE = os.path.join(BASE_DIR, "settings.txt")
+SETTINGS_SCHEMA = 2  # 1 = the original unversioned file
+SETTINGS_QUIET_SECONDS = 3  # settle time before a burst of edits is written out
+SETTINGS_KEYS = ["prayer_data", "timetable", "raw_announcements", "c_idx_masjid", "c_idx_clock", "c_idx_prayer",
+                 "c_idx_prayer_high", "c_idx_greg_cal", "c_idx_hijri_cal", "c_idx_iqamath_text", "c_idx_iqamath_bg",
+                 "hijri_offset", "announcements"]
+SYNCED_KEYS = [k for k in SETTINGS_KEYS if k != "timetable"]  # followers never fetch, so they need no timetable
+METRICS_FILE = os.path.join(BASE_DIR, "metrics.json")
+METRICS_INTERVAL = 300  # seconds between metrics snapshots, kept long to spare the SD card
+METRICS_WINDOW = 600  # samples kept per callback for the rolling percentiles
+CACHE_DIR = os.path.join(BASE_DIR, ".cache")
+SYNC_PORT = 8765  # --serve publishes state here; followers connect with --follow http://<host>:8765
+SYNC_KEEPALIVE = 15  # seconds between SSE comments, so a dead leader is noticed within SYNC_TIMEOUT
+SYNC_TIMEOUT = 45
+# Extra backgrounds dropped into backgrounds/ are rotated with images.png every BG_ROTATE_SECONDS (0 = never)
+BACKGROUND_IMAGES = [IMAGE_PATH] + sorted(glob.glob(os.path.join(BASE_DIR, "backgrounds", "*.png")) +
+                                          glob.glob(os.path.join(BASE_DIR, "backgrounds", "*.jpg")))
+BG_ROTATE_SECONDS = 0
+BG_RESAMPLE = "LANCZOS"
+
+
+# Offline calculation parameters, keyed by the Aladhan METHOD id. Isha is an angle, or minutes after Maghrib.
+CALC_METHODS = {
+    1: {"name": "University of Islamic Sciences, Karachi", "fajr": 18, "isha": 18},
+    2: {"name": "Islamic Society of North America", "fajr": 15, "isha": 15},
+    3: {"name": "Muslim World League", "fajr": 18, "isha": 17},
+    4: {"name": "Umm Al-Qura, Makkah", "fajr": 18.5, "isha_minutes": 90},
+    5: {"name": "Egyptian General Authority of Survey", "fajr": 19.5, "isha": 17.5},
+}
+
+
+# ================= CALCULATION =================
+class PrayerCalculator:
+    """Astronomical prayer times, computed a whole year at a time with NumPy.
+
+    Tables are int16 minutes after local midnight, one row per day and one column per PRAYER_ORDER entry,
+    so looking up a day is a single index."""
+    # Initial guesses (hours) for each PRAYER_ORDER event, refined with the sun position at that time
+    GUESS = (5, 6, 12, 13, 18, 18)
+
+    def __init__(self, lat=LATITUDE, lon=LONGITUDE, tz=TIMEZONE, method=METHOD, asr_school=ASR_SCHOOL,
+                 high_lat=HIGH_LAT_RULE):
+        self.lat, self.lon, self.tz = lat, lon, tz
+        if method not in CALC_METHODS:
+            raise ValueError(f"no offline parameters for Aladhan method {method}")
+        self.params = CALC_METHODS[method]
+        self.asr_factor = 2 if asr_school == 1 else 1
+        self.high_lat = high_lat
+        self._tables = {}
+
+    def year_table(self, year):
+        if year not in self._tables:
+            start = date(year, 1, 1)
+            self._tables[year] = self.compute(start, (date(year + 1, 1, 1) - start).days)
+        return self._tables[year]
+
+    def times_for(self, day):
+        row = self.year_table(day.year)[day.timetuple().tm_yday - 1]
+        return {p: [int(v) // 60, int(v) % 60] for p, v in zip(PRAYER_ORDER, row)}
+
+    @staticmethod
+    def sun_position(jd):
+        import numpy as np
+        d = jd - 2451545.0
+        g = np.radians(357.529 + 0.98560028 * d)
+        q = 280.459 + 0.98564736 * d
+        lam = np.radians(q + 1.915 * np.sin(g) + 0.020 * np.sin(2 * g))
+        e = np.radians(23.439 - 0.00000036 * d)
+        ra = np.degrees(np.arctan2(np.cos(e) * np.sin(lam), np.cos(lam))) / 15
+        eqt = q / 15 - np.mod(ra, 24)
+        eqt = np.mod(eqt + 12, 24) - 12
+        return np.arcsin(np.sin(e) * np.sin(lam)), eqt
+
+    def compute(self, start, days):
+        """Returns a (days, 6) int16 table of minutes after midnight starting at `start`."""
+        import numpy as np
+        guess = np.array(self.GUESS, dtype=float)
+        lat = math.radians(self.lat)
+        jd0 = start.toordinal() + 1721424.5 - self.lon / 360.0
+        jd = (jd0 + np.arange(days, dtype=float))[:, None]
+        fajr, isha = self.params["fajr"], self.params.get("isha")
+        # Depression angles per column; Dhuhr and Asr are handled separately below
+        angles = np.array([fajr, 0.833, 0, 0, 0.833, isha if isha is not None else 0.833])
+        ccw = np.array([True, True, False, False, False, False])
+        t = np.broadcast_to(guess / 24, (days, 6))
+        for _ in range(2):
+            decl, eqt = self.sun_position(jd + t)
+            noon = 12 - eqt
+            asr_alt = np.arctan(1 / (self.asr_factor + np.tan(np.abs(lat - decl))))
+            alt = np.where(np.arange(6) == 3, asr_alt, -np.radians(angles))
+            cos_h = (np.sin(alt) - np.sin(decl) * math.sin(lat)) / (np.cos(decl) * math.cos(lat))
+            with np.errstate(invalid="ignore"):
+                h = np.degrees(np.arccos(cos_h)) / 15
+            times = np.where(ccw, noon - h, noon + h)
+            times[:, 2] = noon[:, 2]
+            t = np.where(np.isnan(times), guess, times) / 24
+        times = times + self.tz - self.lon / 15
+        if isha is None:
+            times[:, 5] = times[:, 4] + self.params["isha_minutes"] / 60
+        if self.high_lat:
+            times = self._adjust_high_lats(times, fajr, isha, self.high_lat)
+        elif np.isnan(times).any():
+            # No rule chosen, yet the sun never reaches Fajr/Isha depth on some days: fill just those from
+            # AngleBased rather than let NaN become a 00:00 azan
+            times = np.where(np.isnan(times), self._adjust_high_lats(times.copy(), fajr, isha, "AngleBased"), times)
+        if np.isnan(times).any():
+            raise ValueError(f"no prayer times at latitude {self.lat} for some days from {start}")
+        minutes = np.floor(np.mod(times, 24) * 60 + 0.5).astype(np.int16)
+        return np.mod(minutes, 24 * 60).astype(np.int16)
+
+    def _adjust_high_lats(self, times, fajr, isha, rule):
+        import numpy as np
+        night = np.mod(times[:, 1] - times[:, 4], 24)
+        portions = {"AngleBased": lambda a: a / 60.0, "OneSeventh": lambda a: 1 / 7.0, "NightMiddle": lambda a: 0.5}
+        portion = portions[rule]
+        fajr_limit = times[:, 1] - portion(fajr) * night
+        bad = np.isnan(times[:, 0]) | (np.mod(times[:, 1] - times[:, 0], 24) > portion(fajr) * night)
+        times[:, 0] = np.where(bad, fajr_limit, times[:, 0])
+        if isha is not None:
+            isha_limit = times[:, 4] + portion(isha) * night
+            bad = np.isnan(times[:, 5]) | (np.mod(times[:, 5] - times[:, 4], 24) > portion(isha) * night)
+            times[:, 5] = np.where(bad, isha_limit, times[:, 5])
+        return times
+
+
+# ================= TIMELINE =================
+def day_schedule(prayer_data, day):
+    """Azan/iqamath datetimes and labels for every prayer on `day`, applying the Friday Jumu'ah rules."""
+    is_friday = day.weekday() == 4
+    midnight = datetime(day.year, day.month, day.day)
+    rows = {}
+    for prayer in PRAYER_ORDER:
+        d = prayer_data[prayer]
+        h, m = d["time"]
+        jumuah = is_friday and prayer == "Dhuhr"
+        start = midnight + timedelta(hours=h, minutes=m)
+        iqamath = start + timedelta(minutes=d.get("jumuah_iqamath" if jumuah else "iqamath", 15))
+        rows[prayer] = {"start": start, "iqamath": iqamath, "name": "JUMMA" if jumuah else prayer,
+                        "azan_text": f"{h:02d}:{m:02d}", "iq_text": iqamath.strftime('%H:%M')}
+    return rows
+
+
+class DayTimeline:
+    """One day's azan, iqamath and highlight-window events, sorted once and walked with a cursor."""
+
+    def __init__(self, day, prayer_data):
+        self.day = day
+        self.rows = day_schedule(prayer_data, day)
+        events = []
+        for prayer, row in self.rows.items():
+            events.append((row["start"], "high_on", prayer))
+            events.append((row["start"] + timedelta(minutes=HIGHLIGHT_MINUTES), "high_off", prayer))
+            if prayer != "Sunrise":
+                events.append((row["start"], "azan", prayer))
+                events.append((row["iqamath"], "iqamath", prayer))
+        events.append((datetime(day.year, day.month, day.day) + timedelta(days=1), "rollover", None))
+        events.sort(key=lambda e: e[0])
+        self.events = events
+        self.times = [e[0] for e in events]
+        self.cursor = 0
+
+    def seek(self, when):
+        """Marks every event at or before `when` as already handled."""
+        self.cursor = bisect_right(self.times, when)
+
+    def peek(self, now):
+        if self.cursor < len(self.events) and self.times[self.cursor] <= now:
+            return self.events[self.cursor]
+        return None
+
+    def advance(self):
+        self.cursor += 1
+
+    def next_deadline(self):
+        return self.times[self.cursor] if self.cursor < len(self.times) else None
+
+    def highlighted(self, now):
+        limit = timedelta(minutes=HIGHLIGHT_MINUTES)
+        return {p for p, r in self.rows.items() if r["start"] <= now <= r["start"] + limit}
+
+
+# ================= ANNOUNCEMENTS =================
+# Scheduled announcements live in settings.txt under "announcements", each a dict with "text" (same ;; and ,,
+# markup as the ticker) plus any of:
+#   "priority": int, higher runs first (default 0, the same as the plain raw_announcements text)
+#   "start" / "end": "YYYY-MM-DD" or "YYYY-MM-DD HH:MM", the overall span ("end" is exclusive)
+#   "days": weekdays it repeats on, e.g. ["Fri"];  "hijri_month": e.g. 9 for Ramadan
+#   "from" / "until": a daily "HH:MM" window, which may wrap past midnight
+#   "before" / "after": a prayer name, with "minutes" (default 60) for the window next to its azan
+def hm_minutes(text):
+    h, m = text.split(":")
+    return int(h) * 60 + int(m)
+
+
+def announcement_windows(ann, day, rows, hijri=None):
+    """Minute-of-day intervals [start, end) in which `ann` is shown on `day`. `hijri()` gives the Hijri date."""
+    if ann.get("days") and WEEKDAYS[day.weekday()] not in ann["days"]: return []
+    if ann.get("hijri_month"):
+        h = hijri() if hijri else None
+        if h is None or h[1] != ann["hijri_month"]: return []
+    if "from" in ann or "until" in ann:
+        lo, hi = hm_minutes(ann.get("from", "00:00")), hm_minutes(ann.get("until", "24:00"))
+        windows = [(lo, hi)] if lo < hi else [(0, hi), (lo, 1440)]
+    elif ann.get("before") or ann.get("after"):
+        start = rows[ann.get("before") or ann["after"]]["start"]
+        at = start.hour * 60 + start.minute
+        span = int(ann.get("minutes", 60))
+        windows = [(at - span, at)] if ann.get("before") else [(at, at + span)]
+    else:
+        windows = [(0, 1440)]
+    midnight = datetime(day.year, day.month, day.day)
+    lo, hi = 0, 1440
+    if ann.get("start"): lo = (datetime.fromisoformat(ann["start"]) - midnight) // timedelta(minutes=1)
+    if ann.get("end"): hi = (datetime.fromisoformat(ann["end"]) - midnight) // timedelta(minutes=1)
+    return [(max(a, lo, 0), min(b, hi, 1440)) for a, b in windows if max(a, lo, 0) < min(b, hi, 1440)]
+
+
+class AnnouncementIndex:
+    """One day of announcement windows cut into elementary segments.
+
+    The window edges are sorted once and every segment between two edges stores its active announcements in
+    priority order, so finding what should be on the ticker at any minute is a single bisect."""
+
+    def __init__(self, entries, day, prayer_data, hijri=None):
+        self.entries = entries
+        self.day = day
+        rows = day_schedule(prayer_data, day)
+        hijri_date = []
+        def lookup():
+            if not hijri_date: hijri_date.append(hijri.lookup(day) if hijri else None)
+            return hijri_date[0]
+        edges = defaultdict(list)  # minute -> [(+1 or -1, entry index)]
+        priority = {}
+        for i, ann in enumerate(entries):
+            try:
+                priority[i] = int(ann.get("priority", 0))
+                windows = announcement_windows(ann, day, rows, lookup)
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Skipping announcement {ann.get('text', '')!r}: {e}")
+                continue
+            for lo, hi in windows:
+                edges[lo].append((1, i))
+                edges[hi].append((-1, i))
+        self.bounds = [0] + sorted(m for m in edges if 0 < m < 1440)
+        self.segments = []
+        counts = defaultdict(int)
+        for bound in self.bounds:
+            for delta, i in edges.get(bound, ()): counts[i] += delta
+            active = [i for i, n in counts.items() if n > 0]
+            active.sort(key=lambda i: (-priority[i], i))
+            self.segments.append(tuple(active))
+
+    def active_at(self, now):
+        return self.segments[bisect_right(self.bounds, now.hour * 60 + now.minute) - 1]
+
+    def texts_at(self, now):
+        """Ticker texts for `now`, highest priority first, without blanks or repeats."""
+        texts = []
+        for i in self.active_at(now):
+            text = self.entries[i].get("text", "")
+            if text.strip() and text not in texts: texts.append(text)
+        return texts
+
+
+# ================= RENDERING =================
+class RenderCache:
+    """Retained state of every canvas item, so updates that would not change anything never reach Tk."""
+
+    def __init__(self, canvas, monotonic=time.monotonic):
+        self.canvas = canvas
+        self.monotonic = monotonic
+        self.items = {}  # item id -> last options pushed to Tk
+        self.coords_cache = {}
+        self.tags = {}  # tag -> item ids created with it
+        self.ops = 0  # canvas calls actually made
+        self.skipped = 0  # calls dropped as no-ops
+        self.ops_per_sec = 0.0
+        self._batch = None  # item -> merged options while a frame is being built
+        self._window_start = monotonic()
+        self._window_ops = 0
+
+    def _count(self, n=1):
+        self.ops += n
+        self._window_ops += n
+        now = self.monotonic()
+        if now - self._window_start >= 1:
+            self.ops_per_sec = self._window_ops / (now - self._window_start)
+            self._window_start, self._window_ops = now, 0
+
+    def create(self, kind, *coords, **options):
+        item = getattr(self.canvas, f"create_{kind}")(*coords, **options)
+        self.items[item] = options
+        self.coords_cache[item] = coords
+        for tag in options.get("tags", ()): self.tags.setdefault(tag, []).append(item)
+        self._count()
+        return item
+
+    def config(self, item, **options):
+        cached = self.items.setdefault(item, {})
+        changed = {k: v for k, v in options.items() if k not in cached or cached[k] != v}
+        if not changed:
+            self.skipped += 1
+            return False
+        cached.update(changed)
+        if self._batch is not None:
+            self._batch.setdefault(item, {}).update(changed)
+            return True
+        self.canvas.itemconfig(item, **changed)
+        self._count()
+        return True
+
+    def begin(self):
+        """Holds itemconfig changes until flush(), so an item touched several times in a frame is sent once."""
+        self._batch = {}
+
+    def flush(self):
+        batch, self._batch = self._batch, None
+        for item, options in (batch or {}).items():
+            self.canvas.itemconfig(item, **options)
+            self._count()
+
+    def cget(self, item, option):
+        cached = self.items.get(item, {})
+        if option in cached: return cached[option]
+        self._count()
+        return self.canvas.itemcget(item, option)
+
+    def coords(self, item, *coords):
+        if self.coords_cache.get(item) == coords:
+            self.skipped += 1
+            return
+        self.coords_cache[item] = coords
+        self.canvas.coords(item, *coords)
+        self._count()
+
+    def move(self, tag, dx, dy):
+        for item in self.tags.get(tag, [tag]): self.coords_cache.pop(item, None)
+        self.canvas.move(tag, dx, dy)
+        self._count()
+
+    def bbox(self, item):
+        self._count()
+        return self.canvas.bbox(item)
+
+    def delete(self, tag):
+        for item in self.tags.pop(tag, [tag]):
+            if self._batch: self._batch.pop(item, None)
+            for other in self.items.get(item, {}).get("tags", ()):
+                if other in self.tags:
+                    self.tags[other].remove(item)
+                    if not self.tags[other]: del self.tags[other]
+            self.items.pop(item, None)
+            self.coords_cache.pop(item, None)
+        self.canvas.delete(tag)
+        self._count()
+
+
+class SpriteCache:
+    """Shadowed text rendered once with PIL and kept in an LRU cache keyed by (text, font, colour).
+
+    Labels come back as ready-made PhotoImages. Clock strings are pasted together from per-character glyph
+    sprites, so a new second only composites a few small cached images. Evicting an image never blanks the
+    screen, because each label keeps a reference to the image it is showing."""
+    SHADOW_OFFSETS = ((-2, -2), (2, -2), (-2, 2), (2, 2))
+    PAD = 2
+    PX_PER_PT = 96 / 72
+
+    def __init__(self, font_file, max_bytes=SPRITE_CACHE_MB << 20, make_photo=None):
+        self.font_file = font_file
+        self.max_bytes = max_bytes
+        if make_photo is None:
+            from PIL import ImageTk
+            make_photo = ImageTk.PhotoImage
+        self.make_photo = make_photo
+        self.bytes = 0
+        self.hits = self.misses = 0
+        self._cache = OrderedDict()  # key -> (image or PhotoImage, approximate bytes)
+        self._fonts = {}
+
+    @staticmethod
+    def find_font():
+        return next((f for f in SPRITE_FONT_FILES if os.path.exists(f)), None)
+
+    def font(self, font):
+        from PIL import ImageFont
+        size = round(abs(font[1]) * self.PX_PER_PT)
+        if size not in self._fonts: self._fonts[size] = ImageFont.truetype(self.font_file, size)
+        return self._fonts[size]
+
+    def _get(self, key, build):
+        entry = self._cache.get(key)
+        if entry is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        value, size = build()
+        self._cache[key] = (value, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes and len(self._cache) > 1:
+            self.bytes -= self._cache.popitem(last=False)[1][1]
+        return value
+
+    def _draw(self, text, font, color, justify="center"):
+        from PIL import Image, ImageDraw
+        pil_font = self.font(font)
+        probe = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+        left, top, right, bottom = map(round, probe.multiline_textbbox((0, 0), text, font=pil_font, align=justify))
+        pad = self.PAD * 2
+        img = Image.new("RGBA", (right - left + pad * 2, bottom - top + pad * 2), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(img)
+        origin = (pad - left, pad - top)
+        for dx, dy in self.SHADOW_OFFSETS:
+            draw.multiline_text((origin[0] + dx, origin[1] + dy), text, font=pil_font, fill="black", align=justify)
+        draw.multiline_text(origin, text, font=pil_font, fill=color, align=justify)
+        return img
+
+    def glyph(self, char, font, color):
+        def build():
+            img = self._draw(char, font, color)
+            return img, img.width * img.height * 4
+        return self._get(("glyph", char, font, color), build)
+
+    def label(self, text, font, color, justify="center", glyphs=False):
+        """PhotoImage of `text` with its shadow; `glyphs` builds it from cached per-character sprites."""
+        if glyphs:  # Clock strings rarely repeat, so only their glyphs are worth keeping
+            return self.make_photo(self._compose(text, font, color))
+
+        def build():
+            img = self._draw(text, font, color, justify)
+            return self.make_photo(img), img.width * img.height * 4
+        return self._get(("label", text, font, color, justify), build)
+
+    def _compose(self, text, font, color):
+        from PIL import Image
+        pil_font = self.font(font)
+        pad = self.PAD * 2
+        # Same ink extents as a whole-string render, so composed and plain labels line up
+        left, top, right, bottom = map(round, pil_font.getbbox(text))
+        img = Image.new("RGBA", (right - left + pad * 2, bottom - top + pad * 2), (0, 0, 0, 0))
+        x = 0.0
+        for char in text:
+            if not char.isspace():
+                sprite = self.glyph(char, font, color)
+                c_left, c_top = map(round, pil_font.getbbox(char)[:2])
+                img.alpha_composite(sprite, (max(round(x) + c_left - left, 0), max(c_top - top, 0)))
+            x += pil_font.getlength(char)
+        return img
+
+
+# ================= ANIMATION =================
+class Animator:
+    """Every colour fade, advanced together by step(), with at most one tween per key.
+
+    Ramps are cached by (start, end, steps), so fades between COLORS entries are only interpolated once."""
+    FRAME_MS = 30
+
+    def __init__(self, root, apply, wake=None):
+        self.root = root
+        self.apply = apply  # apply(key, colour) draws one step
+        self.wake = wake or (lambda: None)  # called when a fade starts, so the frame loop picks it up
+        self.tweens = {}  # key -> [ramp, next index]
+        self._ramps = {}
+        self._rgb = {}
+
+    def rgb(self, color):
+        if color not in self._rgb:
+            # winfo_rgb knows every Tk colour name, not just the few we use; it returns 16-bit channels
+            self._rgb[color] = tuple(c >> 8 for c in self.root.winfo_rgb(color))
+        return self._rgb[color]
+
+    def ramp(self, start, end, steps):
+        key = (start, end, steps)
+        if key not in self._ramps:
+            if len(self._ramps) > 4096: self._ramps.clear()  # Retargeting mid-fade creates one-off start colours
+            a, b = self.rgb(start), self.rgb(end)
+            self._ramps[key] = tuple('#%02x%02x%02x' % tuple(int(a[c] + (b[c] - a[c]) * i / steps) for c in range(3))
+                                     for i in range(1, steps)) + (end,)
+        return self._ramps[key]
+
+    def target(self, key):
+        tween = self.tweens.get(key)
+        return tween[0][-1] if tween else None
+
+    def fade(self, key, current, target, steps=10):
+        """Fades `key` from `current` to `target`; retargets a running tween instead of stacking another."""
+        if self.target(key) == target: return
+        if current.lower() == target.lower():
+            self.tweens.pop(key, None)
+            return
+        self.tweens[key] = [self.ramp(current, target, steps), 0]
+        self.wake()
+
+    def cancel(self, key, finish=True):
+        tween = self.tweens.pop(key, None)
+        if tween and finish: self.apply(key, tween[0][-1])
+
+    def cancel_all(self, finish=True):
+        for key in list(self.tweens): self.cancel(key, finish)
+
+    def step(self):
+        for key, tween in list(self.tweens.items()):
+            ramp, i = tween
+            self.apply(key, ramp[i])
+            tween[1] = i + 1
+            if tween[1] >= len(ramp): del self.tweens[key]
+
+
+class FrameScheduler:
+    """The one after() loop that owns all periodic work.
+
+    Each task says how long until it next wants to run and whether it is active at all. The loop sleeps until
+    the earliest active task is due, so with the ticker hidden and nothing fading the display wakes once a
+    second for the clock. Canvas changes made during a frame are merged and flushed in one pass at its end."""
+
+    def __init__(self, root, gfx, metrics, monotonic=time.monotonic):
+        self.root = root
+        self.gfx = gfx
+        self.metrics = metrics
+        self.monotonic = monotonic
+        self.tasks = []
+        self.frames = 0
+        self._timer = None
+        self._in_frame = False
+
+    def add(self, name, func, delay, active=None):
+        """`delay()` returns seconds until the task's next run; inactive tasks are skipped and never wake us."""
+        self.tasks.append({"name": name, "func": func, "delay": delay, "active": active or (lambda: True),
+                           "due": self.monotonic(), "idle": False})
+
+    def wake(self):
+        """Runs a frame as soon as possible, for when a paused task has just become active."""
+        if not self._in_frame: self._arm(0)
+
+    def _arm(self, seconds):
+        if self._timer is not None: self.root.after_cancel(self._timer)
+        self._timer = self.root.after(max(int(seconds * 1000), 1), self._fire)
+
+    def _fire(self):
+        self._timer = None
+        self.run_frame()
+
+    def run_frame(self):
+        if self._timer is not None:  # Called directly while a frame was already pending
+            self.root.after_cancel(self._timer)
+            self._timer = None
+        self._in_frame = True
+        now = self.monotonic()
+        self.gfx.begin()
+        try:
+            for task in self.tasks:
+                if not task["active"]():
+                    task["idle"] = True
+                    continue
+                if task["idle"]:  # Resuming after a pause is not lateness; start the clock again from here
+                    task["due"], task["idle"] = now, False
+                if now >= task["due"] - 0.002:
+                    self.metrics.run(task["name"], task["func"], task["due"])
+                    task["due"] = now + task["delay"]()
+        finally:
+            self.gfx.flush()
+            self._in_frame = False
+        self.frames += 1
+        due = [t["due"] for t in self.tasks if t["active"]()]
+        if due: self._arm(min(due) - self.monotonic())
+
+
+# ================= HIJRI =================
+class HijriCalendar:
+    """Hijri dates converted a year at a time into a packed table, with a moon-sighting day offset.
+
+    Only the first day of a table goes through hijridate's conversion; the rest are stepped forward with the
+    Umm al-Qura month lengths, so building a year costs a handful of month_length() calls."""
+
+    def __init__(self, offset=0):
+        self.offset = offset
+        self._start = None
+        self._table = array('I')  # year * 10000 + month * 100 + day for each Gregorian day from _start
+        self._month_names = {}
+        self._memo = (None, None)
+
+    def build(self, start, days):
+        from hijridate import Gregorian, Hijri
+        h = Gregorian(start.year, start.month, start.day).to_hijri()
+        y, m, d = h.year, h.month, h.day
+        month_len = Hijri(y, m, 1).month_length()
+        table = array('I')
+        for _ in range(days):
+            table.append(y * 10000 + m * 100 + d)
+            d += 1
+            if d > month_len:
+                d, m = 1, m + 1
+                if m > 12: m, y = 1, y + 1
+                month_len = Hijri(y, m, 1).month_length()
+        self._start, self._table = start, table
+
+    def build_year(self, year):
+        # A month either side so offsets at the year boundary never fall off the table
+        start = date(year, 1, 1) - timedelta(days=31)
+        self.build(start, (date(year + 1, 1, 1) + timedelta(days=31) - start).days)
+
+    def lookup(self, day):
+        """Returns (year, month, day) in Hijri for `day` with the offset applied, or None if out of range."""
+        index = (day - self._start).days + self.offset if self._start else -1
+        if not 0 <= index < len(self._table):
+            try:
+                self.build_year(day.year)
+            except (ValueError, OverflowError) as e:  # hijridate only covers 1343-1500 AH
+                print(f"Hijri date unavailable for {day}: {e}")
+                return None
+            index = (day - self._start).days + self.offset
+        packed = self._table[index]
+        return packed // 10000, packed // 100 % 100, packed % 100
+
+    def set_offset(self, offset):
+        self.offset = max(-HIJRI_MAX_OFFSET, min(HIJRI_MAX_OFFSET, offset))
+        self._memo = (None, None)
+
+    def text_for(self, day):
+        if self._memo[0] != day:
+            h = self.lookup(day)
+            if h is None:
+                text = None
+            else:
+                if h[1] not in self._month_names:
+                    from hijridate import Hijri
+                    self._month_names[h[1]] = Hijri(h[0], h[1], 1).month_name()
+                text = f"{h[2]} {self._month_names[h[1]]} {h[0]} AH"
+            self._memo = (day, text)
+        return self._memo[1]
+
+
+# ================= DIAGNOSTICS =================
+class Metrics:
+    """Rolling callback durations and frame-scheduler lateness, with a periodic JSON snapshot."""
+    BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+    def __init__(self, root, monotonic=time.monotonic, path=METRICS_FILE):
+        self.root = root
+        self.monotonic = monotonic
+        self.path = path  # None disables the snapshot file
+        self.durations = defaultdict(lambda: deque(maxlen=METRICS_WINDOW))
+        self.lateness = defaultdict(lambda: deque(maxlen=METRICS_WINDOW))
+        self.stamps = defaultdict(lambda: deque(maxlen=100))
+        self.last_fetch = None
+
+    def run(self, name, func, due=None):
+        now = self.monotonic()
+        if due is not None: self.lateness[name].append(max(now - due, 0))
+        self.stamps[name].append(now)
+        start = time.perf_counter()
+        try:
+            return func()
+        finally:
+            self.durations[name].append(time.perf_counter() - start)
+
+    def record_fetch(self, seconds, ok):
+        self.durations["fetch_prayer_times"].append(seconds)
+        self.last_fetch = {"seconds": round(seconds, 3), "ok": ok, "at": datetime.now().isoformat(timespec="seconds")}
+
+    def rate(self, name):
+        stamps = self.stamps[name]
+        if len(stamps) < 2 or stamps[-1] == stamps[0]: return 0.0
+        return (len(stamps) - 1) / (stamps[-1] - stamps[0])
+
+    @staticmethod
+    def percentile(values, pct):
+        if not values: return 0.0
+        ordered = sorted(values)
+        return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+    def histogram(self, values):
+        counts = [0] * (len(self.BUCKETS_MS) + 1)
+        for v in values:
+            counts[bisect_right(self.BUCKETS_MS, v * 1000)] += 1
+        return dict(zip([f"<{b}ms" for b in self.BUCKETS_MS] + ["more"], counts))
+
+    def summary(self):
+        out = {}
+        for name in sorted(set(self.durations) | set(self.lateness)):
+            d, late = self.durations[name], self.lateness[name]
+            out[name] = {"samples": len(d), "p50_ms": round(self.percentile(d, 50) * 1000, 2),
+                         "p99_ms": round(self.percentile(d, 99) * 1000, 2),
+                         "late_p50_ms": round(self.percentile(late, 50) * 1000, 2),
+                         "late_p99_ms": round(self.percentile(late, 99) * 1000, 2),
+                         "duration_hist": self.histogram(d), "lateness_hist": self.histogram(late)}
+        return out
+
+    def write(self, extra=None):
+        if self.path is None: return
+        data = {"written": datetime.now().isoformat(timespec="seconds"), "callbacks": self.summary(),
+                "last_fetch": self.last_fetch, **(extra or {})}
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f: json.dump(data, f, indent=1)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"Could not write metrics: {e}")
+
+
+# ================= SETTINGS STORE =================
+class SettingsStore:
+    """Write-behind settings file: changes are coalesced and flushed atomically once edits go quiet."""
+
+    def __init__(self, path=SETTINGS_FILE, quiet=SETTINGS_QUIET_SECONDS):
+        self.path = path  # None keeps settings in memory only
+        self.quiet = quiet
+        self._pending = None  # serialized snapshot waiting to be written
+        self._due = 0
+        self._last_written = None
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = None
+
+    def load(self):
+        """Returns the saved settings, falling back to the previous good copy if the file is damaged."""
+        if self.path is None: return {}
+        for candidate in (self.path, self.path + ".bak"):
+            try:
+                with open(candidate, "r") as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError) as e:
+                print(f"Settings file {candidate} is unreadable ({e}), trying the backup.")
+                if candidate == self.path:
+                    try:
+                        os.replace(self.path, self.path + ".corrupt")  # Kept for inspection
+                    except OSError as e:  # Read-only or failing card: still try the backup
+                        print(f"Could not set aside {self.path}: {e}")
+                continue
+            if not isinstance(data, dict): continue
+            return self.migrate(data)
+        return {}
+
+    @staticmethod
+    def migrate(data):
+        version = data.pop("schema_version", 1)  # Version 1 has the same keys, just no version stamp
+        if not isinstance(version, int) or version > SETTINGS_SCHEMA:
+            print(f"Settings file has schema {version!r} but this version reads up to {SETTINGS_SCHEMA}; "
+                  f"loading the keys it knows and ignoring the rest.")
+        return data
+
+    def save(self, data):
+        if self.path is None: return
+        # Serialized here, on the caller's thread, so later edits to the live objects cannot leak into the write
+        text = json.dumps(dict(data, schema_version=SETTINGS_SCHEMA))
+        with self._cond:
+            self._pending = text
+            self._due = time.monotonic() + self.quiet
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self):
+        """Writes any pending change immediately, e.g. on exit."""
+        with self._cond:
+            text, self._pending = self._pending, None
+        if text is not None: self._write(text)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None or time.monotonic() < self._due:
+                    self._cond.wait(None if self._pending is None else self._due - time.monotonic())
+                text, self._pending = self._pending, None
+            self._write(text)
+
+    def _write(self, text):
+        with self._write_lock:
+            if text == self._last_written: return
+            tmp = self.path + ".tmp"
+            try:
+                with open(tmp, "w") as f:
+                    f.write(text)
+                    f.flush()
+                    os.fsync(f.fileno())
+                if os.path.exists(self.path): os.replace(self.path, self.path + ".bak")
+                os.replace(tmp, self.path)
+                self._last_written = text
+            except OSError as e:
+                print(f"Could not save settings: {e}")
+
+
+# ================= BACKGROUND =================
+class BackgroundLoader:
+    """Decodes and scales backgrounds on a worker thread, keeping a screen-sized copy of each on disk."""
+
+    def __init__(self, root, size, resample=BG_RESAMPLE):
+        self.root = root
+        self.size = size
+        self.resample = resample
+        self.results = queue.Queue()
+        self.photos = {}  # path -> PhotoImage, kept so rotating never decodes again
+
+    def cache_path(self, path):
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()[:16]
+        w, h = self.size
+        return os.path.join(CACHE_DIR, f"bg_{digest}_{w}x{h}_{self.resample.lower()}.png")
+
+    def load(self, paths, on_ready):
+        threading.Thread(target=self._worker, args=(list(paths),), daemon=True).start()
+        self.root.after(50, lambda: self._poll(on_ready))
+
+    def _worker(self, paths):
+        for path in paths:
+            try:
+                self.results.put((path, self._decode(path)))
+            except (OSError, ValueError) as e:
+                print(f"Background {path} could not be loaded: {e}")
+        self.results.put(None)
+
+    def _decode(self, path):
+        from PIL import Image
+        cached = self.cache_path(path)
+        if os.path.exists(cached):
+            img = Image.open(cached)
+            img.load()
+            return img
+        img = Image.open(path).convert("RGB").resize(self.size, getattr(Image.Resampling, self.resample))
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = f"{cached}.{os.getpid()}.tmp"
+        img.save(tmp, "PNG", compress_level=1)  # Cheap to decode, still a fraction of a raw bitmap
+        os.replace(tmp, cached)
+        return img
+
+    def _poll(self, on_ready):
+        while True:
+            try:
+                result = self.results.get_nowait()
+            except queue.Empty:
+                self.root.after(50, lambda: self._poll(on_ready))
+                return
+            if result is None: return
+            path, img = result
+            from PIL import ImageTk
+            self.photos[path] = ImageTk.PhotoImage(img)  # Tk objects must be made on the main thread
+            on_ready(path)
+
+
+# ================= FETCHING =================
+class PrayerTimeFetcher:
+    """Pulls whole months of timings from Aladhan on a worker thread and hands them back to Tk."""
+    API_URL = "http://api.aladhan.com/v1/calendarByCity/{year}/{month}"
+    HIGH_LAT_METHODS = {"NightMiddle": 1, "OneSeventh": 2, "AngleBased": 3}  # Aladhan latitudeAdjustmentMethod
+    RETRY_MIN, RETRY_MAX = 60, 3600  # seconds between whole-fetch retries when every attempt failed
+
+    def __init__(self, root, on_result):
+        self.root = root
+        self.on_result = on_result
+        self.results = queue.Queue()
+        self.busy = False
+        self.retry_delay = self.RETRY_MIN
+        self._retry_timer = None
+        self.session = None  # Built by the first worker, so requests is imported off the UI thread
+
+    def request(self, start=None, months=FETCH_MONTHS_AHEAD):
+        if self.busy: return
+        if self._retry_timer: self.root.after_cancel(self._retry_timer); self._retry_timer = None
+        self.busy = True
+        start = start or datetime.now().date()
+        threading.Thread(target=self._worker, args=(start.year, start.month, months), daemon=True).start()
+        self.root.after(200, self._poll)
+
+    def _make_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        session = requests.Session()
+        retry = Retry(total=4, backoff_factor=2, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET",))
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=2)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _worker(self, year, month, months):
+        started = time.perf_counter()
+        if self.session is None: self.session = self._make_session()
+        from requests import RequestException
+        table, error = {}, None
+        for _ in range(months):
+            try:
+                table.update(self._fetch_month(year, month))
+            except (RequestException, ValueError, KeyError, TypeError) as e:
+                error = e
+                break
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        self.results.put((table, error, time.perf_counter() - started))
+
+    @classmethod
+    def params(cls):
+        """Query for the same method, Asr school and high-latitude rule the offline calculator uses."""
+        params = {"city": CITY, "country": COUNTRY, "method": METHOD, "school": ASR_SCHOOL}
+        if HIGH_LAT_RULE in cls.HIGH_LAT_METHODS:
+            params["latitudeAdjustmentMethod"] = cls.HIGH_LAT_METHODS[HIGH_LAT_RULE]
+        return params
+
+    def _fetch_month(self, year, month):
+        response = self.session.get(self.API_URL.format(year=year, month=month), params=self.params(),
+                                    timeout=(5, 15))
+        response.raise_for_status()
+        days = {}
+        for day in response.json()['data']:
+            d, m, y = day['date']['gregorian']['date'].split('-')
+            # Timings come back as "05:13 (+0530)"
+            days[f"{y}-{m}-{d}"] = {p: [int(x) for x in day['timings'][p][:5].split(':')] for p in PRAYER_ORDER}
+        return days
+
+    def _poll(self):
+        try:
+            table, error, seconds = self.results.get_nowait()
+        except queue.Empty:
+            self.root.after(200, self._poll)
+            return
+        self.busy = False
+        if table:
+            self.retry_delay = self.RETRY_MIN
+        else:
+            self._retry_timer = self.root.after(self.retry_delay * 1000, self.request)
+            self.retry_delay = min(self.retry_delay * 2, self.RETRY_MAX)
+        self.on_result(table, error, seconds)
+
+
+# ================= SYNC =================
+def merge_diff(old, new):
+    """JSON merge patch (RFC 7386) turning `old` into `new`. Synced state never holds None, so None can mark
+    a removed key."""
+    patch = {}
+    for key, value in new.items():
+        if key not in old:
+            patch[key] = value
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            sub = merge_diff(old[key], value)
+            if sub: patch[key] = sub
+        elif old[key] != value:
+            patch[key] = value
+    for key in old:
+        if key not in new: patch[key] = None
+    return patch
+
+
+def merge_apply(target, patch):
+    for key, value in patch.items():
+        if value is None:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            merge_apply(target[key], value)
+        else:
+            target[key] = value
+    return target
+
+
+class StatePublisher:
+    """Serves the leader's state to follower screens over plain HTTP.
+
+    GET /state returns {"v": version, "state": {...}}. GET /events is a Server-Sent Events stream that opens
+    with a "snapshot" event and then sends one "patch" event ({"v", "patch"}) per change."""
+
+    def __init__(self, port=SYNC_PORT, host=""):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        self.state = {}
+        self.version = 0
+        self.lock = threading.Lock()
+        self.clients = []  # one queue per open /events stream
+        publisher = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/state":
+                    body = publisher.snapshot().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                elif self.path == "/events":
+                    publisher.stream(self)
+                else:
+                    self.send_error(404)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def snapshot(self):
+        with self.lock:
+            return json.dumps({"v": self.version, "state": self.state})
+
+    def publish(self, state):
+        """Diffs `state` against the last published one and pushes the patch; returns False when nothing changed."""
+        state = json.loads(json.dumps(state))  # Detached copy, so later in-place edits still show up as changes
+        with self.lock:
+            patch = merge_diff(self.state, state)
+            if not patch: return False
+            self.state = state
+            self.version += 1
+            message = json.dumps({"v": self.version, "patch": patch})
+            for client in self.clients: client.put(("patch", message))
+        return True
+
+    def stream(self, handler):
+        client = queue.Queue()
+        with self.lock:  # Snapshot and registration together, so no patch falls in between
+            events = [("snapshot", json.dumps({"v": self.version, "state": self.state}))]
+            self.clients.append(client)
+        try:
+            handler.send_response(200)
+            handler.send_header("Content-Type", "text/event-stream")
+            handler.send_header("Cache-Control", "no-cache")
+            handler.end_headers()
+            while True:
+                for kind, data in events:
+                    handler.wfile.write(f"event: {kind}\ndata: {data}\n\n".encode())
+                if not events: handler.wfile.write(b": keep-alive\n\n")
+                handler.wfile.flush()
+                try:
+                    event = client.get(timeout=SYNC_KEEPALIVE)
+                except queue.Empty:
+                    events = []
+                    continue
+                if event is None: return  # Publisher closing
+                events = [event]
+        except OSError:
+            pass  # Follower went away
+        finally:
+            with self.lock: self.clients.remove(client)
+
+    def close(self):
+        with self.lock:
+            for client in self.clients: client.put(None)
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class SyncFollower:
+    """Reads a leader's /events stream on a worker thread, reconnecting with backoff whenever the leader is
+    unreachable. The display's frame scheduler calls poll() to hand queued updates to Tk."""
+
+    def __init__(self, url, on_state):
+        self.url = url.rstrip("/")
+        self.on_state = on_state
+        self.state = {}
+        self.version = None
+        self.connected = False
+        self.resync = threading.Event()
+        self.results = queue.Queue()
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    def _worker(self):
+        import urllib.request
+        delay = 1
+        while True:
+            try:
+                with urllib.request.urlopen(self.url + "/events", timeout=SYNC_TIMEOUT) as stream:
+                    delay = 1
+                    kind = data = None
+                    for raw in stream:
+                        line = raw.decode("utf-8").rstrip("\r\n")
+                        if line.startswith("event:"):
+                            kind = line[6:].strip()
+                        elif line.startswith("data:"):
+                            data = json.loads(line[5:])
+                        elif not line and kind:
+                            self.results.put((kind, data))
+                            kind = data = None
+                        if self.resync.is_set(): break
+                self.resync.clear()
+                self.results.put(("error", "stream closed"))
+            except (OSError, ValueError) as e:
+                self.results.put(("error", str(e)))
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    def pending(self):
+        return not self.results.empty()
+
+    def poll(self):
+        try:
+            while True:
+                kind, data = self.results.get_nowait()
+                if kind == "snapshot":
+                    self.state, self.version, self.connected = data["state"], data["v"], True
+                    self.on_state(self.state, self.state)
+                elif kind == "patch" and self.connected:
+                    if data["v"] != self.version + 1:  # Missed an update; start over from a fresh snapshot
+                        self.connected = False
+                        self.resync.set()
+                        continue
+                    self.version = data["v"]
+                    self.on_state(merge_apply(self.state, data["patch"]), data["patch"])
+                elif kind == "error":
+                    if self.connected: print(f"Lost leader {self.url}: {data}")
+                    self.connected = False
+        except queue.Empty:
+            pass
 
 
 class MosqueDisplay:
-    def __init__(self, root):
+    """The full-screen display.
+
+    `root` only needs the after/bind/winfo_* calls of tk.Tk and `canvas` the create_*/itemconfig/coords/move/
+    bbox/delete calls of tk.Canvas, so headless.py can stand in for both. `clock` and `monotonic` replace
+    datetime.now and time.monotonic.
+
+    With `serve` (a port) the display publishes its state for other screens; with `follow` (the leader's URL)
+    it mirrors that state instead of fetching and editing its own, and only runs standalone while the leader
+    is unreachable."""
+
+    def __init__(self, root, canvas=None, clock=None, monotonic=None, settings=None, metrics=None, online=True,
+                 backgrounds=True, sprites=None, serve=None, follow=None):
         self.root = root
+        self.now = clock or datetime.now
+        self.monotonic = monotonic or time.monotonic
+        self.online = online and not follow
+        self.backgrounds = backgrounds
+        self.startup = [("imports", time.perf_counter() - STARTUP_T0)]
+        self._startup_mark = time.perf_counter()
         self.root.attributes("-fullscreen", True)
         self.root.configure(bg="black")
         self.root.bind("<Escape>", self.on_escape)
         self.root.config(cursor="none")
 
         self.prayer_data = DEFAULT_PRAYER_DATA.copy()
+        self.timetable = {}  # "YYYY-MM-DD" -> {prayer: [h, m]}, filled in bulk by the fetcher
         self.raw_announcements = ";; Welcome to Mosque,, Please silent your phones"
+        self.announcements = []  # scheduled entries, see the ANNOUNCEMENTS section
         self.c_idx_masjid = 0
         self.c_idx_clock = 1
         self.c_idx_prayer = 2
@@ -54,29 +1205,57 @@ class MosqueDisplay:
         self.c_idx_hijri_cal = 0
         self.c_idx_iqamath_text = 3
         self.c_idx_iqamath_bg = 0
+        self.hijri_offset = 0
 
         self.ticker_items = []
-        self.ticker_pos = self.root.winfo_screenwidth()
-
-        # Track the current day to trigger auto-updates at midnight
-        self.current_day = datetime.now().day
+        self.ticker_blocks = {}  # announcement text -> its laid-out segments and canvas copies
+        self.ticker_texts = []
+        self.ticker_tags = 0
+        self.ticker_pos = float(self.root.winfo_screenwidth())
+        self.ticker_width = 0
+        self.ticker_last = None
+        self.ann_index = None
 
+        self.settings = settings or SettingsStore()
+        self.metrics = metrics or Metrics(self.root, self.monotonic)
         self.load_settings_from_file()
-        self.fetch_prayer_times()
+        try:
+            self.calculator = PrayerCalculator()
+        except ValueError as e:  # Fetched timings still work; only the offline fallback is lost
+            print(f"Offline prayer times disabled: {e}")
+            self.calculator = None
+        self.hijri = HijriCalendar(self.hijri_offset)
+        # Only cached timings here; the offline calculation waits until the first frame is up
+        self.apply_day_timings(self.now().date(), calculate=False)
+        self.fetcher = PrayerTimeFetcher(self.root, self.on_prayer_times)
+        self.mark_startup("settings")
 
         self.iqamath_active = False
+        self.iqamath_end_time = None
         self.alert_active = False
-        self.triggering_azan = ""
+        self.alert_prayer = None
+        self._timeline_timer = None
         self.preview_mode = False
         self.selected_prayer = None
         self.flash_state = True
-        self.last_interaction_time = datetime.now()
+        self.last_interaction_time = self.now()
 
         self.screen_w = self.root.winfo_screenwidth()
         self.screen_h = self.root.winfo_screenheight()
 
-        self.canvas = tk.Canvas(root, width=self.screen_w, height=self.screen_h, highlightthickness=0, bg="black")
-        self.canvas.pack()
+        if canvas is None:
+            canvas = tk.Canvas(root, width=self.screen_w, height=self.screen_h, highlightthickness=0, bg="black")
+            canvas.pack()
+        self.canvas = canvas
+        self.gfx = RenderCache(self.canvas, self.monotonic)
+        if sprites is None and SPRITE_TEXT:
+            font_file = SpriteCache.find_font()
+            if font_file is None: print("SPRITE_TEXT is on but no font file was found; using canvas text.")
+            sprites = SpriteCache(font_file) if font_file else None
+        self.sprites = sprites
+        self.scheduler = FrameScheduler(self.root, self.gfx, self.metrics, self.monotonic)
+        self.animator = Animator(self.root, lambda p, c: self.update_shadow_text(self.prayer_objs[p], new_color=c),
+                                 wake=self.scheduler.wake)
 
         self.load_background()
         self.setup_ui()
@@ -91,89 +1270,213 @@ class MosqueDisplay:
         self.root.bind("<F5>", lambda e: self.cycle_element("count_txt"))
         self.root.bind("<F6>", lambda e: self.cycle_element("count_bg"))
 
-        self.update_clock()
-        self.scroll_ticker()
+        # From midnight, so a reboot between an azan and its iqamath still shows the alert, but only once
+        # today's times are known; otherwise finish_startup catches up after the offline calculation
+        known = self.now().date().isoformat() in self.timetable
+        self.rebuild_timeline(since=self.midnight() if known else None)
+        self.publisher = StatePublisher(serve) if serve is not None else None
+        self.follower = SyncFollower(follow, self.apply_synced_state) if follow else None
+        if self.follower:
+            # Only active while updates are queued, so it never wakes the display itself; the next frame (at
+            # worst the clock tick a second later) applies them before the clock draws
+            self.scheduler.add("sync", lambda: self.follower.poll(), lambda: 0, active=self.follower.pending)
+        # Order matters: the clock may end the iqamath screen, which lets the ticker run in the same frame
+        self.scheduler.add("update_clock", lambda: self.update_clock(),
+                           lambda: 1 - self.now().microsecond / 1e6 + 0.005)  # Just after each wall-clock second
+        self.scheduler.add("fade_prayer_text", lambda: self.animator.step(), lambda: Animator.FRAME_MS / 1000,
+                           active=lambda: bool(self.animator.tweens))
+        self.scheduler.add("announcements", lambda: self.refresh_announcements(),
+                           lambda: 60 - self.now().second - self.now().microsecond / 1e6 + 0.005)
+        self.scheduler.add("scroll_ticker", lambda: self.scroll_ticker(), lambda: 1 / TICKER_FPS,
+                           active=self.ticker_visible)
+        self.mark_startup("ui")
+        self.scheduler.run_frame()
+        self.root.update_idletasks()
+        self.mark_startup("first_frame")
+        self.root.after(STARTUP_DEFER_MS, self.finish_startup)
+        self.root.after(METRICS_INTERVAL * 1000, self.write_metrics)
+
+    def mark_startup(self, phase):
+        now = time.perf_counter()
+        self.startup.append((phase, now - self._startup_mark))
+        self._startup_mark = now
+
+    def finish_startup(self):
+        """Work that can wait until the clock is on screen: offline times, background decode, first fetch."""
+        self._startup_mark = time.perf_counter()
+        if self.now().date().isoformat() not in self.timetable:
+            self.apply_day_timings(self.now().date())
+            self.rebuild_timeline(since=self.midnight())
+        self.mark_startup("offline_times")
+        paths = [p for p in BACKGROUND_IMAGES if os.path.exists(p)] if self.backgrounds else []
+        if paths: self.bg_loader.load(paths, self.on_background_ready)
+        self.fetch_prayer_times()
+        self.mark_startup("deferred_start")
+        print(self.startup_report())
+
+    def startup_report(self):
+        phases = [phase for phase, _ in self.startup]
+        first = sum(t for _, t in self.startup[:phases.index("first_frame") + 1])
+        parts = ", ".join(f"{phase} {t * 1000:.0f} ms" for phase, t in self.startup)
+        return f"Startup: {first * 1000:.0f} ms to first frame ({parts})"
 
     def load_background(self):
-        if os.path.exists(IMAGE_PATH):
-            try:
-                img = Image.open(IMAGE_PATH).resize((self.screen_w, self.screen_h), Image.Resampling.LANCZOS)
-                self.bg_photo = ImageTk.PhotoImage(img)
-                self.bg_img_id = self.canvas.create_image(0, 0, image=self.bg_photo, anchor="nw")
-            except:
-                self.bg_img_id = self.canvas.create_rectangle(0, 0, self.screen_w, self.screen_h, fill="black")
-        else:
-            self.bg_img_id = self.canvas.create_rectangle(0, 0, self.screen_w, self.screen_h, fill="black")
+        # The canvas is already black; the image is swapped in once the worker has decoded it
+        self.bg_img_id = self.gfx.create("image", 0, 0, anchor="nw")
+        self.bg_path = None
+        self.bg_loader = BackgroundLoader(self.root, (self.screen_w, self.screen_h))
 
-    def fetch_prayer_times(self):
-        """Fetches data from Aladhan API for Matara."""
-        try:
-            url = f"http://api.aladhan.com/v1/timingsByCity?city={CITY}&country={COUNTRY}&method={METHOD}"
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                data = response.json()['data']['timings']
-                mapping = {"Fajr": "Fajr", "Sunrise": "Sunrise", "Dhuhr": "Dhuhr", "Asr": "Asr", "Maghrib": "Maghrib",
-                           "Isha": "Isha"}
-                for api_key, our_key in mapping.items():
-                    h, m = map(int, data[api_key].split(':'))
-                    self.prayer_data[our_key]["time"] = [h, m]
-
-                self.save_settings_to_file()
-                print(f"Prayer times auto-updated for {CITY}: {datetime.now()}")
-        except:
-            print("Auto-update failed: Check internet connection.")
-
-    def hex_to_rgb(self, h):
-        if h.startswith('#'): return tuple(int(h.lstrip('#')[i:i + 2], 16) for i in (0, 2, 4))
-        names = {"gold": (255, 215, 0), "cyan": (0, 255, 255), "red": (255, 0, 0), "white": (255, 255, 255)}
-        return names.get(h.lower(), (255, 255, 255))
-
-    def rgb_to_hex(self, rgb):
-        return '#%02x%02x%02x' % rgb
-
-    def fade_prayer_text(self, prayer_key, target_color, steps=10, current_step=0):
+    def on_background_ready(self, path):
+        if self.bg_path is None:
+            self.bg_path = path
+            self.gfx.config(self.bg_img_id, image=self.bg_loader.photos[path])
+            if BG_ROTATE_SECONDS: self.root.after(BG_ROTATE_SECONDS * 1000, self.rotate_background)
+
+    def rotate_background(self):
+        paths = list(self.bg_loader.photos)
+        self.bg_path = paths[(paths.index(self.bg_path) + 1) % len(paths)]
+        self.gfx.config(self.bg_img_id, image=self.bg_loader.photos[self.bg_path])
+        self.root.after(BG_ROTATE_SECONDS * 1000, self.rotate_background)
+
+    def fetch_prayer_times(self, force=False):
+        """Queues a background refresh from the Aladhan API when cached days are running out."""
+        if not self.online: return
+        today = self.now().date()
+        ahead = sum(1 for d in self.timetable if d >= today.isoformat())
+        if force or ahead < FETCH_REFRESH_DAYS:
+            self.fetcher.request(today)
+
+    def on_prayer_times(self, table, error, seconds=None):
+        if seconds is not None: self.metrics.record_fetch(seconds, bool(table))
+        if not table:
+            print(f"Auto-update failed: Check internet connection. ({error})")
+            return
+        today = self.now().date().isoformat()
+        self.timetable = {d: t for d, t in {**self.timetable, **table}.items() if d >= today}
+        self.apply_day_timings(self.now().date())
+        self.rebuild_timeline()
+        self.save_settings_to_file()
+        print(f"Prayer times auto-updated for {CITY}: {min(table)} to {max(table)}")
+
+    def apply_day_timings(self, day, calculate=True):
+        """Prefers fetched API timings for `day`, falling back to the offline year table."""
+        timings = self.timetable.get(day.isoformat())
+        if not timings:
+            if not calculate or self.calculator is None: return
+            timings = self.calculator.times_for(day)
+        for prayer, hm in timings.items():
+            self.prayer_data[prayer]["time"] = list(hm)
+
+    def rebuild_timeline(self, since=None):
+        """Re-sorts today's events after prayer_data changes; events after `since` (default now) still fire."""
+        now = self.now()
+        self.timeline = DayTimeline(now.date(), self.prayer_data)
+        self.timeline.seek(since or now)
+        self.high_prayers = self.timeline.highlighted(now)
+        self.ann_index = None  # "before Maghrib" windows move with the prayer times
+        self.schedule_timeline()
+
+    def midnight(self):
+        now = self.now()
+        return datetime(now.year, now.month, now.day)
+
+    def schedule_timeline(self, delay=None):
+        if self._timeline_timer: self.root.after_cancel(self._timeline_timer)
+        if delay is None:
+            deadline = self.timeline.next_deadline()
+            delay = min((deadline - self.now()).total_seconds(), TIMELINE_MAX_SLEEP) if deadline else 1
+        self._timeline_timer = self.root.after(max(int(delay * 1000) + 1, 1), self.run_timeline)
+
+    def run_timeline(self):
+        """Fires every event whose deadline has passed, including ones missed while the loop was blocked."""
+        self._timeline_timer = None
+        now = self.now()
+        if now.date() < self.timeline.day:  # Clock stepped backwards across midnight
+            self.apply_day_timings(now.date())
+            return self.rebuild_timeline()
+        changed = False
+        while (event := self.timeline.peek(now)) is not None:
+            _, kind, prayer = event
+            if kind == "rollover":
+                # Served from the prefetched month, no network wait; a connected follower gets it from the leader
+                if not self.following(): self.apply_day_timings(now.date())
+                self.fetch_prayer_times()
+                self.rebuild_timeline(since=self.midnight())
+                return self.run_timeline()
+            if kind == "azan" and self.following():
+                pass  # The leader's alert and iqamath state arrive through apply_synced_state
+            elif kind == "azan":
+                if self.alert_active or self.iqamath_active or self.preview_mode:
+                    return self.schedule_timeline(1)
+                # A late tick still announces the azan as long as its iqamath has not passed yet
+                if now < self.timeline.rows[prayer]["iqamath"]:
+                    self.trigger_prayer_alert(prayer, self.prayer_data[prayer])
+            elif kind == "high_on":
+                self.high_prayers.add(prayer); changed = True
+            elif kind == "high_off":
+                self.high_prayers.discard(prayer); changed = True
+            self.timeline.advance()
+        if changed and not (self.iqamath_active or self.alert_active or self.preview_mode):
+            self.update_prayer_list(now)
+        self.schedule_timeline()
+
+    def fade_prayer_text(self, prayer_key, target_color, steps=10):
         if prayer_key not in self.prayer_objs: return
         obj = self.prayer_objs[prayer_key]
-        current_fill = self.canvas.itemcget(obj["main"], "fill")
-        start_rgb = self.hex_to_rgb(current_fill)
-        end_rgb = self.hex_to_rgb(target_color)
-        if current_step <= steps:
-            new_rgb = tuple(int(start_rgb[i] + (end_rgb[i] - start_rgb[i]) * (current_step / steps)) for i in range(3))
-            self.update_shadow_text(obj, new_color=self.rgb_to_hex(new_rgb))
-            self.root.after(30, lambda: self.fade_prayer_text(prayer_key, target_color, steps, current_step + 1))
-
-    def create_shadow_text(self, x, y, text, font, color, anchor="center", justify="center"):
+        current = obj["sprite"]["color"] if "sprite" in obj else self.gfx.cget(obj["main"], "fill")
+        self.animator.fade(prayer_key, current, target_color, steps)
+
+    def create_shadow_text(self, x, y, text, font, color, anchor="center", justify="center", glyphs=False):
+        if self.sprites:
+            obj = {"main": self.gfx.create("image", x, y, anchor=anchor), "shadows": [],
+                   "sprite": {"text": text, "font": font, "color": color, "justify": justify, "glyphs": glyphs}}
+            self.draw_sprite(obj)
+            return obj
         shadows = []
         for dx, dy in [(-2, -2), (2, -2), (-2, 2), (2, 2)]:
-            s = self.canvas.create_text(x + dx, y + dy, text=text, font=font, fill="black", anchor=anchor,
-                                        justify=justify)
+            s = self.gfx.create("text", x + dx, y + dy, text=text, font=font, fill="black", anchor=anchor,
+                                justify=justify)
             shadows.append(s)
-        main = self.canvas.create_text(x, y, text=text, font=font, fill=color, anchor=anchor, justify=justify)
+        main = self.gfx.create("text", x, y, text=text, font=font, fill=color, anchor=anchor, justify=justify)
         return {"main": main, "shadows": shadows}
 
+    def draw_sprite(self, obj):
+        sp = obj["sprite"]
+        # The label holds on to its own image, so LRU eviction can never blank what is on screen
+        obj["photo"] = self.sprites.label(sp["text"], sp["font"], sp["color"], sp["justify"], sp["glyphs"]) \
+            if sp["text"] else ""
+        self.gfx.config(obj["main"], image=obj["photo"])
+
     def update_shadow_text(self, text_dict, new_text=None, new_color=None):
+        sprite = text_dict.get("sprite")
+        if sprite is not None:
+            before = (sprite["text"], sprite["color"])
+            if new_text is not None: sprite["text"] = new_text
+            if new_color is not None: sprite["color"] = new_color
+            if (sprite["text"], sprite["color"]) != before: self.draw_sprite(text_dict)
+            return
         if new_text is not None:
-            self.canvas.itemconfig(text_dict["main"], text=new_text)
-            for s in text_dict["shadows"]: self.canvas.itemconfig(s, text=new_text)
+            self.gfx.config(text_dict["main"], text=new_text)
+            for s in text_dict["shadows"]: self.gfx.config(s, text=new_text)
         if new_color is not None:
-            self.canvas.itemconfig(text_dict["main"], fill=new_color)
+            self.gfx.config(text_dict["main"], fill=new_color)
 
     def setup_ui(self):
         Y_PRAYER = self.screen_h * 0.75
-        self.full_screen_overlay = self.canvas.create_rectangle(0, 0, self.screen_w, self.screen_h - 120, fill="black",
-                                                                stipple="gray50", outline="")
+        self.full_screen_overlay = self.gfx.create("rectangle", 0, 0, self.screen_w, self.screen_h - 120,
+                                                   fill="black", stipple="gray50", outline="")
         self.title_obj = self.create_shadow_text(self.screen_w // 2, 110, MASJID_NAME, ("Arial", 85, "bold"),
                                                  COLORS[self.c_idx_masjid])
         self.clock_obj = self.create_shadow_text(self.screen_w // 2, self.screen_h * 0.46, "", ("Arial", 140, "bold"),
-                                                 COLORS[self.c_idx_clock])
+                                                 COLORS[self.c_idx_clock], glyphs=True)
         self.date_obj = self.create_shadow_text(self.screen_w // 2, self.screen_h * 0.32, "", ("Arial", 45, "bold"),
                                                 COLORS[self.c_idx_greg_cal])
         self.hijri_obj = self.create_shadow_text(self.screen_w // 2, self.screen_h * 0.60, "", ("Arial", 45, "bold"),
                                                  COLORS[self.c_idx_hijri_cal])
 
         self.ticker_y = self.screen_h - 70
-        self.ticker_bg = self.canvas.create_rectangle(0, self.screen_h - 120, self.screen_w, self.screen_h - 20,
-                                                      fill="#1a1a1a", outline="")
+        self.ticker_bg = self.gfx.create("rectangle", 0, self.screen_h - 120, self.screen_w, self.screen_h - 20,
+                                         fill="#1a1a1a", outline="")
         self.create_rich_ticker()
 
         self.mode_header = self.create_shadow_text(self.screen_w * 0.03, Y_PRAYER + 30, "", ("Arial", 42, "bold"),
@@ -185,11 +1488,43 @@ class MosqueDisplay:
                                             COLORS[self.c_idx_prayer], justify="center")
             self.prayer_objs[prayer] = p_obj
 
-        self.iqamath_bg_rect = self.canvas.create_rectangle(0, 0, self.screen_w, self.screen_h, fill="black",
-                                                            state='hidden')
-        self.iqamath_t = self.canvas.create_text(self.screen_w // 2, self.screen_h // 2, text="",
-                                                 font=("Arial", 160, "bold"), fill="white", state='hidden',
-                                                 justify="center")
+        self.iqamath_bg_rect = self.gfx.create("rectangle", 0, 0, self.screen_w, self.screen_h, fill="black",
+                                               state='hidden')
+        self.iqamath_t = self.gfx.create("text", self.screen_w // 2, self.screen_h // 2, text="",
+                                         font=("Arial", 160, "bold"), fill="white", state='hidden',
+                                         justify="center")
+
+        self.diagnostics_visible = False
+        self.diag_bg = self.gfx.create("rectangle", 10, 10, 620, 250, fill="black", outline="#444444", state='hidden')
+        self.diag_t = self.gfx.create("text", 25, 20, text="", font=("Courier", 18, "bold"), fill="#00FF00",
+                                      anchor="nw", state='hidden')
+
+    def toggle_diagnostics(self):
+        self.diagnostics_visible = not self.diagnostics_visible
+        state = 'normal' if self.diagnostics_visible else 'hidden'
+        self.gfx.config(self.diag_bg, state=state)
+        self.gfx.config(self.diag_t, state=state)
+        if self.diagnostics_visible: self.update_diagnostics()
+
+    def update_diagnostics(self):
+        m = self.metrics
+        ms = lambda name, pct, src=m.durations: f"{m.percentile(src[name], pct) * 1000:6.2f}"
+        fetch = m.last_fetch
+        lines = [f"tick   p50 {ms('update_clock', 50)} p99 {ms('update_clock', 99)} ms",
+                 f"  late p50 {ms('update_clock', 50, m.lateness)} p99 {ms('update_clock', 99, m.lateness)} ms",
+                 f"ticker {m.rate('scroll_ticker'):5.1f} fps  p99 {ms('scroll_ticker', 99)} ms",
+                 f"  late p99 {ms('scroll_ticker', 99, m.lateness)} ms",
+                 f"fade   p99 {ms('fade_prayer_text', 99)} ms",
+                 f"canvas {self.gfx.ops_per_sec:6.1f} ops/s",
+                 f"fetch  {fetch['seconds']:.2f} s {'ok' if fetch['ok'] else 'FAILED'} {fetch['at'][11:16]}"
+                 if fetch else "fetch  none yet"]
+        self.gfx.config(self.diag_t, text="\n".join(lines))
+
+    def write_metrics(self):
+        self.metrics.write({"startup_ms": {phase: round(t * 1000, 1) for phase, t in self.startup},
+                            "canvas_ops_per_sec": round(self.gfx.ops_per_sec, 1),
+                            "ticker_fps": round(self.metrics.rate("scroll_ticker"), 1)})
+        self.root.after(METRICS_INTERVAL * 1000, self.write_metrics)
 
     def toggle_main_ui(self, state):
         items = [self.title_obj["main"], self.clock_obj["main"], self.date_obj["main"], self.hijri_obj["main"],
@@ -198,49 +1533,47 @@ class MosqueDisplay:
             "shadows"] + self.mode_header["shadows"]
         for p in self.prayer_objs.values(): items += [p["main"]] + p["shadows"]
         for t in self.ticker_items: items.append(t)
-        for i in items: self.canvas.itemconfig(i, state=state)
+        if state == 'hidden': self.animator.cancel_all()  # Jump straight to the final colours
+        for i in items: self.gfx.config(i, state=state)
 
     def trigger_prayer_alert(self, prayer_name, data):
+        self.show_prayer_alert(prayer_name)
+        iqamath_at = self.timeline.rows[prayer_name]["iqamath"]
+        self.root.after(10000, lambda: self.start_iqamath(iqamath_at))
+
+    def show_prayer_alert(self, prayer_name):
         self.alert_active = True
-        self.canvas.itemconfig(self.iqamath_bg_rect, fill=BG_COLORS[self.c_idx_iqamath_bg], state='normal')
-        display_name = "JUMU'AH" if (datetime.now().weekday() == 4 and prayer_name == "Dhuhr") else prayer_name.upper()
-        self.canvas.itemconfig(self.iqamath_t, text=f"TIME FOR\n{display_name}", fill=COLORS[self.c_idx_iqamath_text],
-                               state='normal', font=("Arial", 140, "bold"))
+        self.alert_prayer = prayer_name
+        self.gfx.config(self.iqamath_bg_rect, fill=BG_COLORS[self.c_idx_iqamath_bg], state='normal')
+        display_name = "JUMU'AH" if (self.now().weekday() == 4 and prayer_name == "Dhuhr") else prayer_name.upper()
+        self.gfx.config(self.iqamath_t, text=f"TIME FOR\n{display_name}", fill=COLORS[self.c_idx_iqamath_text],
+                        state='normal', font=("Arial", 140, "bold"))
         self.toggle_main_ui('hidden')
-        is_fri = datetime.now().weekday() == 4
-        wait_time = data.get("jumuah_iqamath", data["iqamath"]) if (is_fri and prayer_name == "Dhuhr") else data[
-            "iqamath"]
-        self.root.after(10000, lambda: self.start_iqamath(wait_time))
 
-    def start_iqamath(self, delay):
+    def start_iqamath(self, end_time):
         self.alert_active = False
         self.iqamath_active = True
-        self.iqamath_end_time = datetime.now() + timedelta(minutes=delay)
+        self.iqamath_end_time = end_time
 
     def handle_iqamath_display(self, now):
         rem = (self.iqamath_end_time - now).total_seconds()
         theme_color = COLORS[self.c_idx_iqamath_text]
         if rem > 0:
             m, s = divmod(int(rem), 60)
-            self.canvas.itemconfig(self.iqamath_t, text=f"IQAMATH IN\n{m:02d}:{s:02d}", fill=theme_color)
+            self.gfx.config(self.iqamath_t, text=f"IQAMATH IN\n{m:02d}:{s:02d}", fill=theme_color)
         elif rem > -30:
             self.flash_state = not self.flash_state
-            self.canvas.itemconfig(self.iqamath_t, text="PRAYER\nSTARTING",
-                                   fill=(theme_color if self.flash_state else BG_COLORS[self.c_idx_iqamath_bg]),
-                                   font=("Arial", 180, "bold"))
+            self.gfx.config(self.iqamath_t, text="PRAYER\nSTARTING",
+                            fill=(theme_color if self.flash_state else BG_COLORS[self.c_idx_iqamath_bg]),
+                            font=("Arial", 180, "bold"))
         else:
             self.iqamath_active = False
-            self.canvas.itemconfig(self.iqamath_t, state='hidden')
-            self.canvas.itemconfig(self.iqamath_bg_rect, state='hidden')
+            self.gfx.config(self.iqamath_t, state='hidden')
+            self.gfx.config(self.iqamath_bg_rect, state='hidden')
             self.toggle_main_ui('normal')
 
     def update_clock(self):
-        now = datetime.now()
-
-        # Check if the day has changed (Midnight trigger)
-        if now.day != self.current_day:
-            self.current_day = now.day
-            self.fetch_prayer_times()  # Auto-refresh times for the new day
+        now = self.now()
 
         if self.selected_prayer and (now - self.last_interaction_time).total_seconds() > 10:
             self.selected_prayer = None
@@ -248,110 +1581,210 @@ class MosqueDisplay:
 
         self.update_shadow_text(self.clock_obj, new_text=now.strftime("%I:%M:%S %p"))
         self.update_shadow_text(self.date_obj, new_text=now.strftime("%A, %B %d, %Y"))
-        try:
-            h = Gregorian(now.year, now.month, now.day).to_hijri()
-            self.update_shadow_text(self.hijri_obj, new_text=f"{h.day} {h.month_name()} {h.year} AH")
-        except:
-            pass
+        hijri = self.hijri.text_for(now.date())
+        if hijri: self.update_shadow_text(self.hijri_obj, new_text=hijri)
 
         if self.iqamath_active:
             self.handle_iqamath_display(now)
         elif not self.preview_mode and not self.alert_active:
-            curr_time_str = now.strftime("%H:%M")
-            for p, d in self.prayer_data.items():
-                if p != "Sunrise" and curr_time_str == f"{d['time'][0]:02d}:{d['time'][1]:02d}":
-                    if self.triggering_azan != curr_time_str:
-                        self.triggering_azan = curr_time_str
-                        self.trigger_prayer_alert(p, d)
             self.update_prayer_list(now)
-        self.root.after(1000, self.update_clock)
+        if self.diagnostics_visible: self.update_diagnostics()
+        if self.publisher: self.publisher.publish(self.sync_state())
+
+    def sync_state(self):
+        """What a follower screen needs to draw exactly what this one does."""
+        state = {k: getattr(self, k) for k in SYNCED_KEYS}
+        state["alert"] = {"active": self.alert_active, "prayer": self.alert_prayer or ""}
+        state["iqamath"] = {"active": self.iqamath_active,
+                            "end": self.iqamath_end_time.isoformat() if self.iqamath_active else ""}
+        return state
+
+    def following(self):
+        return self.follower is not None and self.follower.connected
+
+    def apply_synced_state(self, state, patch):
+        """Mirrors the leader; `patch` holds only what changed (the whole state after a snapshot)."""
+        for key in SYNCED_KEYS:
+            if key in patch: setattr(self, key, json.loads(json.dumps(state[key])))  # Keep the follower's copy apart
+        if "prayer_data" in patch: self.rebuild_timeline()
+        if "hijri_offset" in patch:
+            self.hijri.set_offset(self.hijri_offset)
+            self.update_shadow_text(self.hijri_obj, new_text=self.hijri.text_for(self.now().date()))
+        if "c_idx_masjid" in patch:
+            self.create_rich_ticker()
+        elif "raw_announcements" in patch or "announcements" in patch:
+            self.refresh_announcements(rebuild=True)
+        alert, iqamath = state.get("alert", {}), state.get("iqamath", {})
+        if alert.get("active") and not (self.alert_active or self.iqamath_active):
+            # Also arms the local countdown, so the screen moves on even if the leader drops out mid-alert
+            self.trigger_prayer_alert(alert["prayer"], self.prayer_data[alert["prayer"]])
+        if iqamath.get("active") and "iqamath" in patch:
+            if not (self.alert_active or self.iqamath_active): self.show_prayer_alert(alert.get("prayer", ""))
+            self.start_iqamath(datetime.fromisoformat(iqamath["end"]))
+        if any(k in patch for k in SYNCED_KEYS):
+            self.apply_colors()
+            # Kept locally so the screen still shows the right times if it restarts while the leader is down
+            self.save_settings_to_file()
 
     def update_prayer_list(self, now):
-        is_friday = (now.weekday() == 4)
         show_azan = (now.second % 20) < 10
         self.update_shadow_text(self.mode_header, new_text="Azan" if show_azan else "Iqamath",
                                 new_color=COLORS[self.c_idx_prayer])
         for prayer in PRAYER_ORDER:
-            h, m = self.prayer_data[prayer]["time"]
-            ps = now.replace(hour=h, minute=m, second=0, microsecond=0)
-            iq_delay = self.prayer_data[prayer].get(
-                "jumuah_iqamath" if (is_friday and prayer == "Dhuhr") else "iqamath", 15)
-            iq_time = ps + timedelta(minutes=iq_delay)
-            is_high = (ps <= now <= ps + timedelta(minutes=60))
-            display_name = "JUMMA" if (is_friday and prayer == "Dhuhr") else prayer
+            row = self.timeline.rows[prayer]
             target_color = "red" if prayer == self.selected_prayer else (
-                COLORS[self.c_idx_prayer_high] if is_high else COLORS[self.c_idx_prayer])
-            time_val = f"{h:02d}:{m:02d}" if (show_azan or prayer == "Sunrise") else iq_time.strftime('%H:%M')
-            self.update_shadow_text(self.prayer_objs[prayer], new_text=f"{display_name}\n{time_val}")
-            curr_color = self.canvas.itemcget(self.prayer_objs[prayer]["main"], "fill")
-            if curr_color.lower() != target_color.lower(): self.fade_prayer_text(prayer, target_color)
+                COLORS[self.c_idx_prayer_high] if prayer in self.high_prayers else COLORS[self.c_idx_prayer])
+            time_val = row["azan_text"] if (show_azan or prayer == "Sunrise") else row["iq_text"]
+            self.update_shadow_text(self.prayer_objs[prayer], new_text=f"{row['name']}\n{time_val}")
+            self.fade_prayer_text(prayer, target_color)
 
     def show_admin_preview(self, title, detail, is_highlight=False):
         if self.iqamath_active or self.alert_active: return
         self.preview_mode = True
-        self.canvas.coords(self.iqamath_bg_rect, 0, 0, self.screen_w, self.screen_h // 3)
-        self.canvas.coords(self.iqamath_t, self.screen_w // 2, self.screen_h // 6)
+        self.gfx.coords(self.iqamath_bg_rect, 0, 0, self.screen_w, self.screen_h // 3)
+        self.gfx.coords(self.iqamath_t, self.screen_w // 2, self.screen_h // 6)
         bg = COLORS[self.c_idx_prayer_high] if is_highlight else BG_COLORS[self.c_idx_iqamath_bg]
         txt = "black" if (is_highlight and COLORS[self.c_idx_prayer_high] in ["white", "gold", "cyan", "#00FF00"]) else \
         COLORS[self.c_idx_iqamath_text]
-        self.canvas.itemconfig(self.iqamath_bg_rect, fill=bg, state='normal')
-        self.canvas.itemconfig(self.iqamath_t, text=f"{title.upper()}\n{detail}", fill=txt, font=("Arial", 45, "bold"),
-                               state='normal')
+        self.gfx.config(self.iqamath_bg_rect, fill=bg, state='normal')
+        self.gfx.config(self.iqamath_t, text=f"{title.upper()}\n{detail}", fill=txt, font=("Arial", 45, "bold"),
+                        state='normal')
         if hasattr(self, '_prev_timer'): self.root.after_cancel(self._prev_timer)
         self._prev_timer = self.root.after(2000, self.end_preview)
 
     def end_preview(self):
         self.preview_mode = False
-        self.canvas.itemconfig(self.iqamath_bg_rect, state='hidden')
-        self.canvas.itemconfig(self.iqamath_t, state='hidden')
+        self.gfx.config(self.iqamath_bg_rect, state='hidden')
+        self.gfx.config(self.iqamath_t, state='hidden')
 
     def create_rich_ticker(self):
-        for item in self.ticker_items: self.canvas.delete(item)
-        self.ticker_items = []
-        segments = re.split(r'(;;|,,)', self.raw_announcements)
-        for seg in segments:
+        """Lays the announcement strip out from scratch, for when the separator colour changes."""
+        self.gfx.delete("ticker")
+        self.ticker_blocks = {}
+        self.ticker_texts = []
+        self.ticker_width = 0
+        self.refresh_announcements(rebuild=True)
+
+    def refresh_announcements(self, rebuild=False):
+        """Looks up this minute's announcements and updates the ticker when the active set has changed."""
+        now = self.now()
+        if rebuild or self.ann_index is None or self.ann_index.day != now.date():
+            entries = [{"text": self.raw_announcements}]
+            for ann in self.announcements:
+                text = ann.get("text", "") if isinstance(ann, dict) else ""
+                if not text.strip(): continue
+                # A leading star keeps a scheduled notice apart from whatever scrolls before it
+                entries.append(dict(ann, text=text if text.lstrip().startswith((";;", ",,")) else ";; " + text))
+            self.ann_index = AnnouncementIndex(entries, now.date(), self.prayer_data, self.hijri)
+        texts = self.ann_index.texts_at(now)
+        if texts != self.ticker_texts: self.update_ticker(texts)
+
+    def ticker_segments(self, text):
+        segments = []
+        for seg in re.split(r'(;;|,,)', text):
             if not seg.strip(): continue
-            txt, clr = ((" ★ ", COLORS[self.c_idx_masjid]) if seg == ";;" else (
-            " • ", COLORS[self.c_idx_masjid]) if seg == ",," else (seg, "white"))
-            t_obj = self.canvas.create_text(self.screen_w, self.ticker_y, text=txt, font=("Arial", 32, "bold"),
-                                            fill=clr, anchor="w")
-            self.ticker_items.append(t_obj)
+            segments.append((" ★ ", COLORS[self.c_idx_masjid]) if seg == ";;" else (
+                " • ", COLORS[self.c_idx_masjid]) if seg == ",," else (seg, "white"))
+        return segments
+
+    def create_ticker_copy(self, block, x, state):
+        """Draws one copy of a block with its left edge at strip offset `x`, measuring it if it is the first."""
+        self.ticker_tags += 1
+        tag = f"ticker{self.ticker_tags}"
+        measure = block["offsets"] is None
+        if measure: block["offsets"] = []
+        offset = 0
+        for i, (txt, clr) in enumerate(block["segments"]):
+            if measure:
+                block["offsets"].append(offset)
+            else:
+                offset = block["offsets"][i]
+            # Tk has no bbox for hidden items, so a first copy is drawn visible, measured, then hidden
+            item = self.gfx.create("text", x + offset + int(self.ticker_pos), self.ticker_y, text=txt,
+                                   font=TICKER_FONT, fill=clr, anchor="w", state='normal' if measure else state,
+                                   tags=("ticker", tag))
+            if measure:
+                # Each segment is measured exactly once, when its announcement first appears
+                bbox = self.gfx.bbox(item)
+                offset += (bbox[2] - bbox[0]) if bbox else 0
+                if state != 'normal': self.gfx.config(item, state=state)
+        if measure: block["width"] = offset
+        return tag
+
+    def update_ticker(self, texts):
+        """Brings the strip in line with `texts`: blocks that are gone are deleted, new ones are drawn and the
+        rest only slide to their new place."""
+        state = 'hidden' if (self.alert_active or self.iqamath_active) else 'normal'
+        blocks = self.ticker_blocks
+        for text in [t for t in blocks if t not in texts]:
+            for tag in blocks.pop(text)["copies"].values(): self.gfx.delete(tag)
+        for text in texts:
+            if text not in blocks:
+                block = blocks[text] = {"segments": self.ticker_segments(text), "offsets": None, "width": 0}
+                block["copies"] = {0: self.create_ticker_copy(block, 0, state)}
+                block["x"] = {0: 0}
+        width = 0
+        for text in texts:
+            blocks[text]["start"] = width
+            width += blocks[text]["width"]
+        old_pos = self.ticker_pos
+        if width > 0 and self.ticker_pos <= -width: self.ticker_pos = -(-self.ticker_pos % width)
+        shift = int(self.ticker_pos) - int(old_pos)
+        copies = int(self.screen_w // width) + 2 if width > 0 else 0
+        for text in texts:
+            block = blocks[text]
+            for copy in list(block["copies"]):
+                tag = block["copies"][copy]
+                if copy >= copies:
+                    self.gfx.delete(tag)
+                    del block["copies"][copy], block["x"][copy]
+                    continue
+                x = copy * width + block["start"]
+                dx = x - block["x"][copy] + shift
+                if dx: self.gfx.move(tag, dx, 0)
+                block["x"][copy] = x
+            for copy in range(copies):
+                if copy not in block["copies"]:
+                    x = copy * width + block["start"]
+                    block["copies"][copy] = self.create_ticker_copy(block, x, state)
+                    block["x"][copy] = x
+        self.ticker_texts = list(texts)
+        self.ticker_width = width
+        self.ticker_items = list(self.gfx.tags.get("ticker", []))
+        self.scheduler.wake()
 
     def scroll_ticker(self):
-        if self.ticker_items:
-            self.ticker_pos -= 2
-            curr_x = self.ticker_pos
-            for item in self.ticker_items:
-                self.canvas.coords(item, curr_x, self.ticker_y)
-                bbox = self.canvas.bbox(item)
-                if bbox: curr_x += (bbox[2] - bbox[0])
-            if self.ticker_pos < -3000: self.ticker_pos = self.screen_w
-        self.root.after(30, self.scroll_ticker)
+        now = self.monotonic()
+        elapsed = min(max(now - self.ticker_last, 0), 0.25) if self.ticker_last else 0
+        self.ticker_last = now
+        if self.ticker_items and self.ticker_width > 0:
+            new_pos = self.ticker_pos - TICKER_SPEED * elapsed
+            # Copy n+1 sits exactly where copy n started, so jumping back one strip width is invisible
+            if new_pos <= -self.ticker_width: new_pos = -(-new_pos % self.ticker_width)
+            dx = int(new_pos) - int(self.ticker_pos)
+            self.ticker_pos = new_pos
+            if dx: self.gfx.move("ticker", dx, 0)
+
+    def ticker_visible(self):
+        # Nothing to scroll while the alert or iqamath screen covers the ticker
+        return bool(self.ticker_items) and self.ticker_width > 0 and not (self.alert_active or self.iqamath_active)
 
     def apply_colors(self):
         for obj, idx in [(self.title_obj, self.c_idx_masjid), (self.clock_obj, self.c_idx_clock),
                          (self.date_obj, self.c_idx_greg_cal), (self.hijri_obj, self.c_idx_hijri_cal)]:
             self.update_shadow_text(obj, new_color=COLORS[idx])
         self.update_shadow_text(self.mode_header, new_color=COLORS[self.c_idx_prayer])
-        self.update_prayer_list(datetime.now())
+        self.update_prayer_list(self.now())
 
     def save_settings_to_file(self):
-        data = {k: getattr(self, k) for k in
-                ["prayer_data", "raw_announcements", "c_idx_masjid", "c_idx_clock", "c_idx_prayer", "c_idx_prayer_high",
-                 "c_idx_greg_cal", "c_idx_hijri_cal", "c_idx_iqamath_text", "c_idx_iqamath_bg"]}
-        with open(SETTINGS_FILE, "w") as f: json.dump(data, f)
+        self.settings.save({k: getattr(self, k) for k in SETTINGS_KEYS})
 
     def load_settings_from_file(self):
-        if os.path.exists(SETTINGS_FILE):
-            try:
-                with open(SETTINGS_FILE, "r") as f:
-                    data = json.load(f)
-                    for k, v in data.items():
-                        if hasattr(self, k): setattr(self, k, v)
-            except:
-                pass
+        for k, v in self.settings.load().items():
+            if hasattr(self, k): setattr(self, k, v)
 
     def cycle_element(self, element):
+        if self.following(): return  # Edits are made on the leader
         if element == "masjid":
             self.c_idx_masjid = (self.c_idx_masjid + 1) % len(COLORS)
         elif element == "clock":
@@ -376,9 +1809,10 @@ class MosqueDisplay:
 
     def handle_keys(self, event):
         if hasattr(self, 'ed') and self.ed.winfo_exists(): return
-        self.last_interaction_time = datetime.now()
+        self.last_interaction_time = self.now()
         char = event.char.lower()
-        is_fri = (datetime.now().weekday() == 4)
+        if self.following() and char != "d": return  # Edits are made on the leader
+        is_fri = (self.now().weekday() == 4)
         if char in "123456": self.selected_prayer = PRAYER_ORDER[int(char) - 1]; self.apply_colors(); return
         if self.selected_prayer:
             p = self.prayer_data[self.selected_prayer]
@@ -396,8 +1830,17 @@ class MosqueDisplay:
                 lbl = "JUMMA IQ" if (is_fri and self.selected_prayer == "Dhuhr") else "IQ"
                 self.show_admin_preview(f"EDITING: {self.selected_prayer}",
                                         f"TIME {p['time'][0]:02d}:{p['time'][1]:02d} | {lbl} {p[f]}m")
+                self.rebuild_timeline()
                 self.save_settings_to_file();
                 self.apply_colors()
+        if char in ("[", "]"):
+            self.hijri.set_offset(self.hijri_offset + (1 if char == "]" else -1))
+            self.hijri_offset = self.hijri.offset
+            hijri = self.hijri.text_for(self.now().date())
+            self.show_admin_preview("HIJRI OFFSET", f"{self.hijri_offset:+d} DAY | {hijri}")
+            self.update_shadow_text(self.hijri_obj, new_text=hijri)
+            self.save_settings_to_file()
+        if char == "d": self.toggle_diagnostics()
         if char == "t": self.open_announcement_editor()
 
     def open_announcement_editor(self):
@@ -412,15 +1855,23 @@ class MosqueDisplay:
 
     def save_ann(self, e):
         self.raw_announcements = self.en.get();
-        self.create_rich_ticker();
+        self.refresh_announcements(rebuild=True);
         self.save_settings_to_file();
         self.ed.destroy()
 
     def on_escape(self, event):
+        self.settings.flush()
+        if self.publisher: self.publisher.close()
         self.root.destroy()
 
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Full-screen prayer time display")
+    parser.add_argument("--serve", type=int, nargs="?", const=SYNC_PORT, metavar="PORT",
+                        help=f"publish this screen's state to follower screens (port {SYNC_PORT} if omitted)")
+    parser.add_argument("--follow", metavar="URL", help="mirror a leader screen, e.g. http://192.168.1.10:8765")
+    args = parser.parse_args()
     root = tk.Tk()
-    app = MosqueDisplay(root)
+    app = MosqueDisplay(root, serve=args.serve, follow=args.follow)
     root.mainloop()
\ No newline at end of file
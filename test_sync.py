@@ -0,0 +1,114 @@
+"""Leader/follower state sync over a loopback server.
+
+    python -m unittest test_sync
+"""
+import json
+import time
+import unittest
+import urllib.request
+from datetime import datetime, timedelta
+
+import main
+from bench import make_display
+
+
+def wait_for(condition, follower, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        follower.poll()
+        if condition(): return True
+        time.sleep(0.02)
+    return False
+
+
+class MergePatchTest(unittest.TestCase):
+    def test_round_trip(self):
+        old = {"a": 1, "b": {"x": [1, 2], "y": "keep"}, "gone": True}
+        new = {"a": 2, "b": {"x": [1, 3], "y": "keep"}, "added": {"k": 0}}
+        patch = main.merge_diff(old, new)
+        self.assertEqual(patch, {"a": 2, "b": {"x": [1, 3]}, "added": {"k": 0}, "gone": None})
+        self.assertEqual(main.merge_apply(json.loads(json.dumps(old)), patch), new)
+        self.assertEqual(main.merge_diff(new, new), {})
+
+
+class LoopbackTest(unittest.TestCase):
+    def setUp(self):
+        self.publisher = main.StatePublisher(port=0, host="127.0.0.1")
+        self.url = f"http://127.0.0.1:{self.publisher.port}"
+        self.state = {"prayer_data": {"Fajr": {"time": [4, 45], "iqamath": 20}}, "hijri_offset": 0}
+        self.publisher.publish(self.state)
+
+    def tearDown(self):
+        self.publisher.close()
+
+    def test_snapshot_endpoint(self):
+        with urllib.request.urlopen(self.url + "/state", timeout=5) as response:
+            body = json.load(response)
+        self.assertEqual(body, {"v": 1, "state": self.state})
+
+    def test_follower_tracks_state_and_version(self):
+        follower = main.SyncFollower(self.url, lambda state, patch: None)
+        self.assertTrue(wait_for(lambda: follower.connected, follower))
+        self.assertEqual((follower.version, follower.state), (1, self.state))
+        self.state["prayer_data"]["Fajr"]["iqamath"] = 25
+        self.assertFalse(self.publisher.publish(json.loads(json.dumps(self.publisher.state))))  # Unchanged
+        self.assertTrue(self.publisher.publish(self.state))
+        self.assertTrue(wait_for(lambda: follower.version == 2, follower))
+        self.assertEqual(follower.state, self.state)
+
+    def test_version_gap_forces_resync(self):
+        seen = []
+        follower = main.SyncFollower(self.url, lambda state, patch: seen.append(patch))
+        self.assertTrue(wait_for(lambda: follower.connected, follower))
+        # A patch that skips a version must not be applied; the follower drops it and reconnects
+        follower.results.put(("patch", {"v": follower.version + 2, "patch": {"hijri_offset": 2}}))
+        follower.poll()
+        self.assertFalse(follower.connected)
+        self.assertTrue(follower.resync.is_set())
+        self.state["hijri_offset"] = 1
+        self.publisher.publish(self.state)
+        self.assertTrue(wait_for(lambda: follower.connected, follower, timeout=main.SYNC_KEEPALIVE + 5))
+        self.assertEqual((follower.version, follower.state["hijri_offset"]), (2, 1))
+        self.assertNotIn({"hijri_offset": 2}, seen)
+
+
+class ApplySyncedStateTest(unittest.TestCase):
+    def setUp(self):
+        self.root, self.canvas, self.app = make_display(datetime(2026, 10, 15, 11, 30))
+        self.app.follower = type("Connected", (), {"connected": True})()
+        self.state = json.loads(json.dumps(self.app.sync_state()))
+
+    def text(self):
+        return self.canvas.text_of(self.app.iqamath_t)
+
+    def test_alert_then_iqamath(self):
+        self.state["alert"] = {"active": True, "prayer": "Dhuhr"}
+        self.app.apply_synced_state(self.state, {"alert": self.state["alert"]})
+        self.assertTrue(self.app.alert_active)
+        self.assertEqual(self.text(), "TIME FOR\nDHUHR")
+        end = datetime(2026, 10, 15, 11, 50)
+        self.state["alert"]["active"] = False
+        self.state["iqamath"] = {"active": True, "end": end.isoformat()}
+        self.app.apply_synced_state(self.state, {"alert": {"active": False}, "iqamath": self.state["iqamath"]})
+        self.assertFalse(self.app.alert_active)
+        self.assertTrue(self.app.iqamath_active)
+        self.assertEqual(self.app.iqamath_end_time, end)
+        self.root.run_for(2)
+        self.assertTrue(self.text().startswith("IQAMATH IN\n19:"))
+
+    def test_joining_during_iqamath_shows_the_countdown(self):
+        end = self.app.now() + timedelta(minutes=5)
+        self.state["alert"] = {"active": False, "prayer": "Asr"}
+        self.state["iqamath"] = {"active": True, "end": end.isoformat()}
+        self.app.apply_synced_state(self.state, self.state)
+        self.assertTrue(self.app.iqamath_active)
+        self.assertEqual(self.app.gfx.items[self.app.iqamath_bg_rect]["state"], "normal")
+
+    def test_followed_azan_is_left_to_the_leader(self):
+        h, m = self.app.prayer_data["Dhuhr"]["time"]
+        self.root.run_until(datetime(2026, 10, 15, h, m, 5))
+        self.assertFalse(self.app.alert_active)
+
+
+if __name__ == "__main__":
+    unittest.main()